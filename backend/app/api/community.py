@@ -1,12 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import Dict, Any, List
 from app.services.community_service import CommunityService
-from app.services.auth_service import AuthService
-from app.api.auth import oauth2_scheme
+from app.api.auth import oauth2_scheme, auth_service
 
 router = APIRouter()
 community_service = CommunityService()
-auth_service = AuthService()
 
 @router.post("/posts")
 async def create_post(
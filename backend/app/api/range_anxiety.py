@@ -1,21 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Dict, Any
-from app.services.range_anxiety_service import RangeAnxietyService
-from app.services.auth_service import AuthService
-from app.api.auth import oauth2_scheme
+import os
+import json
+import asyncio
+import logging
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Request, status
+from typing import Dict, Any, List, Optional, AsyncIterator
+from app.services.range_anxiety_service import RangeAnxietyService, SegmentEnergyModel, LOW_CHARGE_PERCENTAGE, SEGMENT_CHUNK_SIZE
+from app.api.auth import oauth2_scheme, auth_service
+from app.api import tesla as tesla_api
+from app.api.weather import weather_service
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 range_anxiety_service = RangeAnxietyService()
-auth_service = AuthService()
+batch_max_rows = int(os.getenv("RANGE_ANXIETY_BATCH_MAX_ROWS", "100000"))
 
 @router.post("/calculate")
 async def calculate_range_anxiety(
     vehicle_data: Dict[str, Any],
     weather_data: Dict[str, Any],
     route_data: Dict[str, Any],
+    uncertainty: Optional[Dict[str, Any]] = None,
     token: str = Depends(oauth2_scheme)
 ) -> Dict[str, Any]:
-    """计算续航焦虑指数"""
+    """
+    计算续航焦虑指数
+    可选 uncertainty（如 {"samples": 10000, "seed": 0, "distributions": {"temp": {"dist": "normal", "std": 3}}}）
+    用于蒙特卡洛估计剩余电量的分位数和需要充电的概率；
+    route_data 可用 points（[{"lat": ..., "lon": ...}, ...]）代替 elevation_change，由本地高程数据计算爬升和下降
+    """
     user = auth_service.verify_token(token)
     if not user:
         raise HTTPException(
@@ -23,11 +36,19 @@ async def calculate_range_anxiety(
             detail="Invalid authentication credentials"
         )
     
-    anxiety_data = range_anxiety_service.calculate_range_anxiety(
-        vehicle_data,
-        weather_data,
-        route_data
-    )
+    try:
+        anxiety_data = range_anxiety_service.calculate_range_anxiety(
+            vehicle_data,
+            weather_data,
+            route_data,
+            uncertainty,
+            owner=user["id"]
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
     if not anxiety_data:
         raise HTTPException(
@@ -37,6 +58,321 @@ async def calculate_range_anxiety(
     
     return anxiety_data
 
+@router.post("/calculate/batch")
+async def calculate_range_anxiety_batch(
+    columns: Dict[str, List[Any]] = Body(...),
+    token: str = Depends(oauth2_scheme)
+) -> Dict[str, Any]:
+    """
+    批量计算续航焦虑指数
+    请求体为列存数据，如 {"current_charge": [...], "battery_capacity": [...], "max_range": [...], "distance": [...]}，
+    可选列 passengers、cargo_weight、elevation_change、temp、humidity、wind_speed、model_type；
+    返回同样按列组织的结果
+    """
+    user = auth_service.verify_token(token)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+
+    rows = max((len(values) for values in columns.values()), default=0)
+    if rows > batch_max_rows:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {batch_max_rows} rows per batch"
+        )
+
+    try:
+        results = range_anxiety_service.calculate_range_anxiety_batch(columns)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    return {"count": rows, **{name: values.tolist() for name, values in results.items()}}
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[Any]:
+    """逐行解析流式上传的 NDJSON 请求体"""
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buffer.strip():
+        yield json.loads(buffer)
+
+@router.post("/calculate/segments")
+async def calculate_range_anxiety_segments(
+    request: Request,
+    token: str = Depends(oauth2_scheme)
+) -> Dict[str, Any]:
+    """
+    按路段流式计算续航焦虑指数
+    请求体为 NDJSON：第一行为 {"vehicle_data": {...}, "weather_data": {...}}，之后每行一个路段
+    （distance、elevation_change，可选 temp、humidity、wind_speed）；路段边接收边计算
+    """
+    user = auth_service.verify_token(token)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+
+    model = None
+    chunk: List[Dict[str, Any]] = []
+    try:
+        async for item in _iter_ndjson(request):
+            if model is None:
+                model = SegmentEnergyModel(
+                    range_anxiety_service,
+                    item["vehicle_data"],
+                    item.get("weather_data") or {},
+                    owner=user["id"]
+                )
+                continue
+            chunk.append(item)
+            if len(chunk) >= SEGMENT_CHUNK_SIZE:
+                model.add(chunk)
+                chunk = []
+        if model is None:
+            raise ValueError("Missing vehicle_data header line")
+        model.add(chunk)
+    except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid segment stream: {str(e)}"
+        )
+
+    return model.result()
+
+# Tesla 车辆配置中的车型编码
+CAR_TYPES = {
+    "model3": "Model 3",
+    "modely": "Model Y",
+    "models": "Model S",
+    "models2": "Model S",
+    "modelx": "Model X"
+}
+
+def _vehicle_inputs(
+    vehicle: Dict[str, Any],
+    battery_capacity: float,
+    max_range: Optional[float]
+) -> Dict[str, Any]:
+    """将车辆数据映射为续航焦虑计算所需的车辆参数"""
+    data = vehicle.get("response", vehicle)
+    charge_state = data.get("charge_state", {})
+    battery_level = charge_state.get("battery_level", 0)
+    if max_range is None:
+        # battery_range 为当前电量对应的续航（英里），按电量比例换算满电续航（公里）
+        battery_range = charge_state.get("battery_range")
+        if battery_range and battery_level:
+            max_range = battery_range * 1.609344 / (battery_level / 100)
+    return {
+        "battery_level": battery_level,
+        "battery_capacity": battery_capacity,
+        "current_charge": battery_capacity * battery_level / 100,
+        "max_range": max_range,
+        "model_type": CAR_TYPES.get(data.get("vehicle_config", {}).get("car_type"), "Model Y")
+    }
+
+def _vehicle_location(vehicle: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    drive_state = vehicle.get("response", vehicle).get("drive_state", {})
+    if drive_state.get("latitude") is None or drive_state.get("longitude") is None:
+        return None
+    return {"lat": drive_state["latitude"], "lon": drive_state["longitude"]}
+
+async def _weather_inputs(lat: float, lon: float) -> Dict[str, Any]:
+    """获取天气并映射为续航焦虑计算所需的天气参数，失败时使用默认天气"""
+    try:
+        weather = await weather_service.get_weather(lat, lon)
+    except Exception as e:
+        logger.error(f"Error getting weather for range anxiety: {str(e) or type(e).__name__}")
+        return {}
+    if not weather:
+        return {}
+    return {
+        "temp": weather.get("main", {}).get("temp", 20),
+        "humidity": weather.get("main", {}).get("humidity", 50),
+        "wind_speed": weather.get("wind", {}).get("speed", 0)
+    }
+
+@router.get("/vehicles/{vehicle_id}")
+async def get_vehicle_range_anxiety(
+    vehicle_id: str,
+    dest_lat: float,
+    dest_lon: float,
+    origin_lat: Optional[float] = None,
+    origin_lon: Optional[float] = None,
+    battery_capacity: float = 75.0,
+    max_range: Optional[float] = None,
+    passengers: int = 1,
+    cargo_weight: float = 0.0,
+    token: str = Depends(oauth2_scheme),
+    tesla_token: Optional[str] = Header(None, alias="X-Tesla-Token")
+) -> Dict[str, Any]:
+    """
+    一次请求计算车辆到目的地的续航焦虑指数
+    服务端并发获取车辆数据、充电站目录和天气，规划路线后按各段计算焦虑指数
+    （汇总字段为到达首个充电站或终点的一段，legs 为各段结果）；
+    路线按天气、负载和车辆效率折算后的续航里程规划，并在每段到达时保留 LOW_CHARGE_PERCENTAGE 电量
+    （当前电量不足该值时不保留），规划结果与焦虑计算使用同一能耗模型；
+    Tesla 令牌必须通过 X-Tesla-Token 请求头传入，Authorization 中的本服务令牌不会发送给 Tesla。
+    提供 origin_lat/origin_lon 时天气与车辆数据同时获取，否则在取得车辆位置后获取
+    """
+    user = auth_service.verify_token(token)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    if battery_capacity <= 0 or (max_range is not None and max_range <= 0):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="battery_capacity and max_range must be positive"
+        )
+
+    if not tesla_token:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="X-Tesla-Token header is required"
+        )
+    origin = None
+    if origin_lat is not None and origin_lon is not None:
+        origin = {"lat": origin_lat, "lon": origin_lon}
+    destination = {"lat": dest_lat, "lon": dest_lon}
+
+    fetchers = [
+        tesla_api.tesla_service.get_vehicle_data(tesla_token, vehicle_id),
+        tesla_api.charger_catalog.get()
+    ]
+    if origin is not None:
+        fetchers.append(_weather_inputs(origin["lat"], origin["lon"]))
+    vehicle, catalog, *prefetched = await asyncio.gather(*fetchers)
+
+    if not vehicle:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle data not available, the vehicle may be asleep"
+        )
+    if not catalog:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No superchargers found"
+        )
+
+    vehicle_data = _vehicle_inputs(vehicle, battery_capacity, max_range)
+    vehicle_data.update(vehicle_id=vehicle_id, passengers=passengers, cargo_weight=cargo_weight)
+    start = origin or _vehicle_location(vehicle)
+    if start is None or not vehicle_data["max_range"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Vehicle location or range unavailable, provide origin and max_range"
+        )
+
+    weather_data = prefetched[0] if prefetched else await _weather_inputs(start["lat"], start["lon"])
+    battery_level = vehicle_data["battery_level"]
+    route = await tesla_api.tesla_service.plan_route(
+        catalog,
+        start,
+        destination,
+        battery_level,
+        range_anxiety_service.effective_range(vehicle_data, weather_data, owner=user["id"]),
+        reserve=LOW_CHARGE_PERCENTAGE if battery_level > LOW_CHARGE_PERCENTAGE else 0.0
+    )
+    if not route:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Could not calculate route"
+        )
+
+    # 途中充电后电量重置，按规划的各段分别计算
+    anxiety_data = range_anxiety_service.calculate_trip_range_anxiety(
+        vehicle_data,
+        weather_data,
+        route["legs"],
+        owner=user["id"]
+    )
+    return {
+        "vehicle_id": vehicle_id,
+        **anxiety_data,
+        "inputs": {
+            "vehicle_data": vehicle_data,
+            "weather_data": weather_data
+        },
+        "route": route
+    }
+
+@router.post("/vehicles/{vehicle_id}/telemetry")
+async def ingest_vehicle_telemetry(
+    vehicle_id: str,
+    battery_capacity: float = Body(...),
+    max_range: float = Body(...),
+    samples: Dict[str, List[float]] = Body(...),
+    vehicle_model: Optional[str] = Body(None, alias="model_type"),
+    token: str = Depends(oauth2_scheme)
+) -> Dict[str, Any]:
+    """
+    上传车辆遥测样本，增量学习该车的效率系数
+    samples 为列存数据，如 {"distance": [...], "energy_used": [...], "temp": [...], "elevation_change": [...]}，
+    可选列 humidity、wind_speed、passengers、cargo_weight；model_type 用于估计爬坡能耗，样本足够后计算续航焦虑时
+    vehicle_data 带上 vehicle_id 即使用学习到的系数；系数按当前用户保存，只对上传者本人的计算生效
+    """
+    user = auth_service.verify_token(token)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+
+    rows = max((len(values) for values in samples.values()), default=0)
+    if rows > batch_max_rows:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {batch_max_rows} samples per request"
+        )
+
+    try:
+        return range_anxiety_service.ingest_telemetry(
+            user["id"],
+            vehicle_id,
+            battery_capacity,
+            max_range,
+            samples,
+            vehicle_model
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.get("/vehicles/{vehicle_id}/efficiency")
+async def get_vehicle_efficiency(
+    vehicle_id: str,
+    token: str = Depends(oauth2_scheme)
+) -> Dict[str, Any]:
+    """获取车辆学习到的效率系数及最近遥测样本的统计"""
+    user = auth_service.verify_token(token)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+
+    efficiency = range_anxiety_service.vehicle_efficiency.describe(user["id"], vehicle_id)
+    if efficiency is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No telemetry for this vehicle"
+        )
+
+    return {"vehicle_id": vehicle_id, **efficiency}
+
 @router.get("/model-efficiency")
 async def get_model_efficiency(
     model_type: str,
@@ -1,13 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import json
 from ..services.tesla_service import TeslaService
-from ..core.logging import logger
+from ..services.charger_catalog import ChargerCatalogCache
+from ..services.wake_service import WakeJobManager
+from ..core.cache import CacheEntry
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 tesla_service = TeslaService()
+charger_catalog = ChargerCatalogCache(tesla_service.get_service_superchargers)
+wake_jobs = WakeJobManager(tesla_service)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+def _set_freshness_headers(response: Response, snapshot: CacheEntry, hit: bool) -> None:
+    """在响应头中标注快照的新鲜度"""
+    response.headers["Age"] = str(int(snapshot.age))
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    response.headers["X-Snapshot-Time"] = datetime.utcfromtimestamp(snapshot.timestamp).isoformat() + "Z"
+
 @router.post("/login")
 async def login(email: str, password: str):
     """登录 Tesla 账号"""
@@ -30,8 +46,7 @@ async def login(email: str, password: str):
 async def get_vehicles(token: str = Depends(oauth2_scheme)):
     """获取用户的所有车辆"""
     try:
-        tesla_service.token = token
-        vehicles = await tesla_service.get_vehicles()
+        vehicles = await tesla_service.get_vehicles(token)
         if not vehicles:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -49,14 +64,15 @@ async def get_vehicles(token: str = Depends(oauth2_scheme)):
 async def get_superchargers(token: str = Depends(oauth2_scheme)):
     """获取所有超级充电站位置"""
     try:
-        tesla_service.token = token
-        superchargers = await tesla_service.get_supercharger_locations()
-        if not superchargers:
+        catalog = await charger_catalog.get()
+        if not catalog:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No superchargers found"
             )
-        return superchargers
+        return list(catalog.chargers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting superchargers: {str(e)}")
         raise HTTPException(
@@ -64,18 +80,68 @@ async def get_superchargers(token: str = Depends(oauth2_scheme)):
             detail="Failed to get superchargers"
         )
 
+@router.post("/vehicles/batch")
+async def get_vehicles_data_batch(
+    vehicle_ids: Optional[List[str]] = None,
+    concurrency: Optional[int] = None,
+    stream: bool = False,
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    批量获取车辆数据
+    请求体为车辆ID列表，省略时获取账号下所有车辆；stream 为 true 时以 NDJSON 逐条返回
+    """
+    try:
+        if not vehicle_ids:
+            vehicle_ids = await tesla_service.get_fleet_vehicle_ids(token)
+        if not vehicle_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No vehicles found"
+            )
+
+        if stream:
+            async def ndjson():
+                async for item in tesla_service.iter_vehicles_data(token, vehicle_ids, concurrency):
+                    yield json.dumps(item) + "\n"
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+        results = await tesla_service.get_vehicles_data_batch(token, vehicle_ids, concurrency)
+        failed = sum(1 for item in results if "error" in item)
+        return {
+            "results": results,
+            "succeeded": len(results) - failed,
+            "failed": failed
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting vehicle data batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get vehicle data"
+        )
+
 @router.get("/vehicles/{vehicle_id}", response_model=Dict[str, Any])
-async def get_vehicle_data(vehicle_id: str, token: str = Depends(oauth2_scheme)):
-    """获取特定车辆的数据"""
+async def get_vehicle_data(
+    vehicle_id: str,
+    response: Response,
+    max_age: Optional[float] = None,
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    获取特定车辆的数据
+    max_age 为可接受的最大数据年龄（秒），响应头 Age / X-Cache 标注数据新鲜度
+    """
     try:
-        tesla_service.token = token
-        vehicle_data = await tesla_service.get_vehicle_data(vehicle_id)
-        if not vehicle_data:
+        snapshot, hit = await tesla_service.get_vehicle_snapshot(token, vehicle_id, max_age)
+        if not snapshot or not snapshot.value:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Vehicle not found"
             )
-        return vehicle_data
+        _set_freshness_headers(response, snapshot, hit)
+        return snapshot.value
     except Exception as e:
         logger.error(f"Error getting vehicle data: {str(e)}")
         raise HTTPException(
@@ -84,17 +150,22 @@ async def get_vehicle_data(vehicle_id: str, token: str = Depends(oauth2_scheme))
         )
 
 @router.get("/vehicles/{vehicle_id}/state", response_model=Dict[str, Any])
-async def get_vehicle_state(vehicle_id: str, token: str = Depends(oauth2_scheme)):
-    """获取车辆状态"""
+async def get_vehicle_state(
+    vehicle_id: str,
+    response: Response,
+    max_age: Optional[float] = None,
+    token: str = Depends(oauth2_scheme)
+):
+    """获取车辆状态，新鲜度标注同车辆数据接口"""
     try:
-        tesla_service.token = token
-        state = await tesla_service.get_vehicle_state(vehicle_id)
-        if not state:
+        snapshot, hit = await tesla_service.get_vehicle_state_snapshot(token, vehicle_id, max_age)
+        if not snapshot or not snapshot.value:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Vehicle state not found"
             )
-        return state
+        _set_freshness_headers(response, snapshot, hit)
+        return snapshot.value
     except Exception as e:
         logger.error(f"Error getting vehicle state: {str(e)}")
         raise HTTPException(
@@ -106,8 +177,7 @@ async def get_vehicle_state(vehicle_id: str, token: str = Depends(oauth2_scheme)
 async def wake_up_vehicle(vehicle_id: str, token: str = Depends(oauth2_scheme)):
     """唤醒车辆"""
     try:
-        tesla_service.token = token
-        success = await tesla_service.wake_up_vehicle(vehicle_id)
+        success = await tesla_service.wake_up_vehicle(token, vehicle_id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -121,24 +191,59 @@ async def wake_up_vehicle(vehicle_id: str, token: str = Depends(oauth2_scheme)):
             detail="Failed to wake up vehicle"
         )
 
+@router.post("/vehicles/{vehicle_id}/wake-jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_wake_job(vehicle_id: str, token: str = Depends(oauth2_scheme)):
+    """
+    创建服务端唤醒任务
+    服务端负责唤醒并轮询车辆状态，同一车辆进行中的任务会被复用
+    """
+    job = wake_jobs.start(token, vehicle_id)
+    return job.to_dict()
+
+@router.get("/wake-jobs/{job_id}")
+async def get_wake_job(
+    job_id: str,
+    wait: float = 0,
+    token: str = Depends(oauth2_scheme)
+):
+    """查询唤醒任务状态，wait 大于 0 时最多等待 wait 秒直到任务完成（长轮询）"""
+    job = wake_jobs.get(token, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Wake job not found"
+        )
+    job = await wake_jobs.wait(job, min(max(wait, 0), 30))
+    return job.to_dict()
+
 @router.post("/route")
 async def calculate_route(
     start_location: Dict[str, float],
     end_location: Dict[str, float],
     current_battery_level: float,
     max_range: float,
+    charge_to: float = 100.0,
+    reserve: float = 0.0,
+    optimize: str = "time",
     token: str = Depends(oauth2_scheme)
 ):
     """计算包含充电站的路线"""
     try:
-        tesla_service.token = token
-        superchargers = await tesla_service.get_supercharger_locations()
-        route = tesla_service.calculate_route_with_charging(
+        catalog = await charger_catalog.get()
+        if not catalog:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No superchargers found"
+            )
+        route = await tesla_service.plan_route(
+            catalog,
             start_location,
             end_location,
             current_battery_level,
             max_range,
-            superchargers
+            charge_to=charge_to,
+            reserve=reserve,
+            optimize=optimize
         )
         if not route:
             raise HTTPException(
@@ -146,9 +251,105 @@ async def calculate_route(
                 detail="Could not calculate route"
             )
         return route
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error calculating route: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to calculate route"
-        ) 
\ No newline at end of file
+        )
+
+@router.post("/route/batch")
+async def calculate_routes_batch(
+    trips: List[Dict[str, Any]],
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    批量计算包含充电站的路线
+    每个行程包含 start_location、end_location、current_battery_level、max_range，
+    以及可选的 charge_to、reserve、optimize；结果与输入顺序一致
+    """
+    if len(trips) > tesla_service.route_batch_max_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {tesla_service.route_batch_max_size} trips per batch"
+        )
+    required = ("start_location", "end_location", "current_battery_level", "max_range")
+    for trip in trips:
+        if any(field not in trip for field in required):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Each trip requires {', '.join(required)}"
+            )
+
+    try:
+        catalog = await charger_catalog.get()
+        if not catalog:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No superchargers found"
+            )
+        routes = await tesla_service.plan_routes(catalog, trips)
+        return {
+            "results": [
+                route if route else {"error": "Could not calculate route"}
+                for route in routes
+            ]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error calculating route batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to calculate routes"
+        )
+
+@router.get("/reachable")
+async def get_reachable_chargers(
+    lat: float,
+    lon: float,
+    current_battery_level: float,
+    max_range: float,
+    reserve: float = 0.0,
+    offset: int = 0,
+    limit: int = 50,
+    token: str = Depends(oauth2_scheme)
+):
+    """获取当前电量可达的充电站，按距离升序分页返回"""
+    if max_range <= 0 or offset < 0 or not 1 <= limit <= 500:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="max_range must be positive, offset non-negative and limit between 1 and 500"
+        )
+
+    try:
+        catalog = await charger_catalog.get()
+        if not catalog:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No superchargers found"
+            )
+        return tesla_service.find_reachable_chargers(
+            catalog,
+            {"lat": lat, "lon": lon},
+            current_battery_level,
+            max_range,
+            reserve=reserve,
+            offset=offset,
+            limit=limit
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error finding reachable chargers: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to find reachable chargers"
+        )
+
+@router.get("/cache-stats")
+async def get_cache_stats(token: str = Depends(oauth2_scheme)):
+    """获取车辆快照与路线缓存的命中统计"""
+    return tesla_service.cache_stats()
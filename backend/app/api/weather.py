@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Dict, Any
+import math
+import asyncio
+from fastapi import APIRouter, Body, Depends, HTTPException, status
+from typing import Dict, Any, List
 from app.services.weather_service import WeatherService
-from app.services.auth_service import AuthService
-from app.api.auth import oauth2_scheme
+from app.services.forecast import FORECAST_FIELDS, parse_time
+from app.api.auth import oauth2_scheme, auth_service
 
 router = APIRouter()
 weather_service = WeatherService()
-auth_service = AuthService()
 
 @router.get("/current")
 async def get_current_weather(
@@ -22,7 +23,13 @@ async def get_current_weather(
             detail="Invalid authentication credentials"
         )
     
-    weather_data = await weather_service.get_weather(lat, lon)
+    try:
+        weather_data = await weather_service.get_weather(lat, lon)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Weather service timed out"
+        )
     if not weather_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -44,7 +51,13 @@ async def get_weather_forecast(
             detail="Invalid authentication credentials"
         )
     
-    forecast_data = await weather_service.get_weather_forecast(lat, lon)
+    try:
+        forecast_data = await weather_service.get_weather_forecast(lat, lon)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Weather service timed out"
+        )
     if not forecast_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -66,7 +79,13 @@ async def get_weather_impact(
             detail="Invalid authentication credentials"
         )
     
-    weather_data = await weather_service.get_weather(lat, lon)
+    try:
+        weather_data = await weather_service.get_weather(lat, lon)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Weather service timed out"
+        )
     if not weather_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -77,4 +96,87 @@ async def get_weather_impact(
     return {
         "weather_data": weather_data,
         "impact_factor": impact
-    } 
\ No newline at end of file
+    }
+
+@router.post("/route")
+async def get_weather_along_route(
+    route: List[Dict[str, float]] = Body(..., embed=True),
+    interval_km: float = 25.0,
+    token: str = Depends(oauth2_scheme)
+) -> Dict[str, Any]:
+    """
+    获取沿路线分段的天气
+    请求体为 {"route": [{"lat": ..., "lon": ...}, ...]}，可直接提交路线规划接口的返回结果
+    """
+    user = auth_service.verify_token(token)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+
+    if len(route) < 2 or interval_km <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="route needs at least two points and interval_km must be positive"
+        )
+    if any("lat" not in point or "lon" not in point for point in route):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each route point requires lat and lon"
+        )
+
+    return await weather_service.get_weather_along_route(route, interval_km)
+
+@router.post("/forecast/at")
+async def get_forecast_at(
+    points: List[Dict[str, Any]] = Body(..., embed=True),
+    token: str = Depends(oauth2_scheme)
+) -> Dict[str, Any]:
+    """
+    获取各位置在指定时刻的预报天气（如到达各充电站时的天气）
+    请求体为 {"points": [{"lat": ..., "lon": ..., "time": ...}, ...]}，time 为 Unix 秒或 ISO 8601 时间
+    """
+    user = auth_service.verify_token(token)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+
+    if not 1 <= len(points) <= weather_service.forecast_max_points:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {weather_service.forecast_max_points} points per request"
+        )
+    try:
+        lats = [float(point["lat"]) for point in points]
+        lons = [float(point["lon"]) for point in points]
+        times = [parse_time(point["time"]) for point in points]
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each point requires lat, lon and time"
+        )
+
+    forecast = await weather_service.forecast_at(lats, lons, times)
+    results = []
+    for i in range(len(points)):
+        result = {"lat": lats[i], "lon": lons[i], "time": times[i], "tile": forecast["tiles"][i]}
+        for field in FORECAST_FIELDS:
+            value = float(forecast[field][i])
+            result[field] = None if math.isnan(value) else value
+        result["extrapolated"] = bool(forecast["extrapolated"][i])
+        results.append(result)
+    return {"points": results}
+
+@router.get("/cache-stats")
+async def get_cache_stats(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """获取天气缓存的命中统计"""
+    user = auth_service.verify_token(token)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    return weather_service.cache_stats()
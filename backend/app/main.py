@@ -4,6 +4,7 @@ from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException
 from app.api import auth, tesla, weather, community, range_anxiety
 from app.core.logging import setup_logging
+from app.core.http_client import http_client
 from app.core.middleware import (
     error_handler_middleware,
     validation_exception_handler,
@@ -45,10 +46,19 @@ app.include_router(range_anxiety.router, prefix="/api/range-anxiety", tags=["Ran
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting up Tesla Navigation API")
+    await http_client.start()
+    tesla.charger_catalog.load_offline()
+    if tesla.charger_catalog.catalog is None and not tesla.tesla_service.service_token:
+        logger.error("Neither TESLA_SERVICE_TOKEN nor CHARGER_CATALOG_PATH is configured, supercharger catalog will be empty")
+    tesla.charger_catalog.start_background_refresh()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Tesla Navigation API")
+    await tesla.charger_catalog.stop_background_refresh()
+    await tesla.wake_jobs.shutdown()
+    tesla.tesla_service.route_pool.shutdown()
+    await http_client.close()
 
 @app.get("/")
 async def root():
@@ -0,0 +1,165 @@
+import os
+import time
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Sequence
+from dotenv import load_dotenv
+from app.services.charger_index import ChargerIndex
+from app.services.charger_store import load_charger_store
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ChargerFetcher = Callable[[], Awaitable[List[Dict[str, Any]]]]
+
+
+class ChargerCatalog:
+    """充电站目录快照：原始列表及其派生结构（坐标数组、空间索引）"""
+
+    def __init__(
+        self,
+        chargers: Sequence[Dict[str, Any]],
+        version: int,
+        index: Optional[ChargerIndex] = None,
+        source_path: Optional[str] = None
+    ):
+        self.chargers = chargers
+        self.index = index if index is not None else ChargerIndex.from_chargers(chargers)
+        self.version = version
+        # 从离线目录文件载入时记录其路径，工作进程可直接映射同一文件
+        self.source_path = source_path
+        self.fetched_at = time.time()
+        self._loaded_at = time.monotonic()
+
+    @property
+    def age(self) -> float:
+        """快照已存在的秒数"""
+        return time.monotonic() - self._loaded_at
+
+
+class ChargerCatalogCache:
+    """
+    进程级充电站目录缓存
+
+    过期后先返回旧快照，同时在后台刷新（stale-while-revalidate）；
+    同一时间只有一个刷新在进行，派生结构在每次刷新时只构建一次。
+    充电站数据与用户无关，刷新使用构造时指定的 fetcher（服务端凭据），不使用请求方的令牌。
+    """
+
+    def __init__(
+        self,
+        fetcher: Optional[ChargerFetcher] = None,
+        ttl: Optional[float] = None,
+        refresh_interval: Optional[float] = None
+    ):
+        self.ttl = ttl if ttl is not None else float(os.getenv("CHARGER_CATALOG_TTL", "3600"))
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None
+            else float(os.getenv("CHARGER_CATALOG_REFRESH_INTERVAL", str(self.ttl)))
+        )
+        self._catalog: Optional[ChargerCatalog] = None
+        self._fetcher = fetcher
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._background_task: Optional[asyncio.Task] = None
+        self._version = 0
+        # 刷新失败后至少间隔 retry_interval 秒才会由请求再次触发刷新
+        self.retry_interval = float(os.getenv("CHARGER_CATALOG_RETRY_INTERVAL", "60"))
+        self._last_attempt = float("-inf")
+        self.offline_path = os.getenv("CHARGER_CATALOG_PATH")
+
+    def load_offline(self, path: Optional[str] = None) -> Optional[ChargerCatalog]:
+        """
+        从离线目录文件载入充电站目录作为初始快照
+        离线快照始终视为过期，首次请求时会在后台尝试从上游刷新
+        """
+        path = path or self.offline_path
+        if not path or self._catalog is not None:
+            return self._catalog
+        try:
+            index = load_charger_store(path)
+        except Exception as e:
+            logger.error(f"Error loading offline supercharger catalog from {path}: {str(e)}")
+            return None
+        self._catalog = ChargerCatalog(index.chargers, self._version, index=index, source_path=path)
+        logger.info(f"Loaded offline supercharger catalog: size={len(index)}")
+        return self._catalog
+
+    @property
+    def catalog(self) -> Optional[ChargerCatalog]:
+        """当前快照（可能已过期）"""
+        return self._catalog
+
+    def is_stale(self) -> bool:
+        """快照是否不存在或已过期"""
+        if self._catalog is None or self._catalog.source_path is not None:
+            return True
+        return self._catalog.age > self.ttl
+
+    def _should_retry(self) -> bool:
+        """距上次刷新尝试是否已超过 retry_interval"""
+        return time.monotonic() - self._last_attempt >= self.retry_interval
+
+    async def get(self) -> Optional[ChargerCatalog]:
+        """
+        获取充电站目录，尚无快照时等待首次刷新
+        首次刷新失败后同样按 retry_interval 退避，期间直接返回 None（进行中的刷新仍会共享）
+        """
+        if self._catalog is None:
+            refreshing = self._refresh_task is not None and not self._refresh_task.done()
+            if refreshing or self._should_retry():
+                return await self.refresh()
+            return None
+        if self.is_stale() and self._should_retry():
+            self._start_refresh()
+        return self._catalog
+
+    async def refresh(self) -> Optional[ChargerCatalog]:
+        """立即刷新目录，并发调用会共享同一次刷新"""
+        return await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._do_refresh())
+        return self._refresh_task
+
+    async def _do_refresh(self) -> Optional[ChargerCatalog]:
+        if self._fetcher is None:
+            return self._catalog
+        self._last_attempt = time.monotonic()
+        try:
+            chargers = await self._fetcher()
+            if not chargers:
+                logger.warning("Supercharger refresh returned no data, keeping previous catalog")
+                return self._catalog
+
+            # 在线程池中构建索引，避免阻塞事件循环
+            loop = asyncio.get_running_loop()
+            catalog = await loop.run_in_executor(None, ChargerCatalog, chargers, self._version + 1)
+            self._version = catalog.version
+            self._catalog = catalog
+            logger.info(f"Supercharger catalog refreshed: version={catalog.version}, size={len(catalog.index)}")
+        except Exception as e:
+            logger.error(f"Error refreshing supercharger catalog: {str(e)}")
+        return self._catalog
+
+    def start_background_refresh(self) -> None:
+        """启动后台定时刷新任务"""
+        if self._background_task is None or self._background_task.done():
+            self._background_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop_background_refresh(self) -> None:
+        """停止后台刷新任务"""
+        if self._background_task is not None:
+            self._background_task.cancel()
+            try:
+                await self._background_task
+            except asyncio.CancelledError:
+                pass
+            self._background_task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            if self._fetcher is not None:
+                await self.refresh()
@@ -0,0 +1,174 @@
+import math
+import numpy as np
+from typing import List, Dict, Any, Sequence, Tuple
+from app.services.geo import EARTH_RADIUS_KM, haversine_one_to_many, to_radians
+
+
+class ChargerIndex:
+    """
+    充电站空间索引（经纬度网格）
+
+    充电站按网格单元编号排序后存放在连续数组中，半径查询只需对覆盖到的
+    网格行做二分查找，再对候选点做一次向量化的距离计算。
+    """
+
+    def __init__(self, lats: Sequence[float], lons: Sequence[float], chargers: Sequence[Any],
+                 cell_deg: float = 1.0):
+        self.chargers = chargers
+        self.cell_deg = cell_deg
+        self.n_rows = int(math.ceil(180.0 / cell_deg))
+        self.n_cols = int(math.ceil(360.0 / cell_deg))
+
+        lats_deg = np.asarray(lats, dtype=np.float64)
+        lons_deg = np.asarray(lons, dtype=np.float64)
+        self.lats, self.lons = to_radians(lats_deg, lons_deg)
+
+        keys = self._row(lats_deg) * self.n_cols + self._col(lons_deg)
+        self._order = np.argsort(keys, kind="stable")
+        self._keys = keys[self._order]
+
+    @classmethod
+    def from_chargers(cls, superchargers: List[Dict[str, Any]], cell_deg: float = 1.0) -> "ChargerIndex":
+        """从充电站列表构建索引，缺少坐标的充电站会被忽略"""
+        chargers = [
+            charger for charger in superchargers
+            if charger.get("location")
+            and charger["location"].get("lat") is not None
+            and charger["location"].get("lon") is not None
+        ]
+        lats = [charger["location"]["lat"] for charger in chargers]
+        lons = [charger["location"]["lon"] for charger in chargers]
+        return cls(lats, lons, chargers, cell_deg)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        order: np.ndarray,
+        keys: np.ndarray,
+        chargers: Sequence[Any],
+        cell_deg: float = 1.0
+    ) -> "ChargerIndex":
+        """
+        从预先计算好的数组构建索引（弧度坐标、网格排序及排序后的网格编号）
+        数组不会被复制，可以直接使用内存映射的文件
+        """
+        index = cls.__new__(cls)
+        index.chargers = chargers
+        index.cell_deg = cell_deg
+        index.n_rows = int(math.ceil(180.0 / cell_deg))
+        index.n_cols = int(math.ceil(360.0 / cell_deg))
+        index.lats = lats
+        index.lons = lons
+        index._order = order
+        index._keys = keys
+        return index
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """导出索引数组，与 from_arrays 对应"""
+        return {
+            "lat": self.lats,
+            "lon": self.lons,
+            "order": self._order,
+            "keys": self._keys
+        }
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def _row(self, lats_deg):
+        rows = np.floor((np.asarray(lats_deg) + 90.0) / self.cell_deg).astype(np.int64)
+        return np.clip(rows, 0, self.n_rows - 1)
+
+    def _col(self, lons_deg):
+        cols = np.floor((np.asarray(lons_deg) + 180.0) / self.cell_deg).astype(np.int64)
+        return np.mod(cols, self.n_cols)
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """返回可能落在半径内的充电站下标（按网格粗筛）"""
+        angular = radius_km / EARTH_RADIUS_KM
+        dlat = math.degrees(angular)
+        row_lo = max(int(math.floor((lat - dlat + 90.0) / self.cell_deg)), 0)
+        row_hi = min(int(math.floor((lat + dlat + 90.0) / self.cell_deg)), self.n_rows - 1)
+
+        # 覆盖到极点或半径过大时，经度方向需要整行扫描
+        cos_lat = math.cos(math.radians(lat))
+        if lat + dlat >= 90.0 or lat - dlat <= -90.0 or math.sin(angular) >= cos_lat:
+            full_row = True
+        else:
+            dlon = math.degrees(math.asin(math.sin(angular) / cos_lat))
+            col_lo = int(math.floor((lon - dlon + 180.0) / self.cell_deg))
+            col_hi = int(math.floor((lon + dlon + 180.0) / self.cell_deg))
+            full_row = col_hi - col_lo + 1 >= self.n_cols
+
+        # 每个网格行对应一个（跨越日期变更线时为两个）连续的编号区间
+        ranges = []
+        for row in range(row_lo, row_hi + 1):
+            base = row * self.n_cols
+            if full_row:
+                ranges.append((base, base + self.n_cols - 1))
+                continue
+            lo = col_lo % self.n_cols
+            hi = col_hi % self.n_cols
+            if lo <= hi:
+                ranges.append((base + lo, base + hi))
+            else:
+                ranges.append((base + lo, base + self.n_cols - 1))
+                ranges.append((base, base + hi))
+
+        bounds = np.asarray(ranges, dtype=np.int64)
+        starts = np.searchsorted(self._keys, bounds[:, 0], side="left")
+        ends = np.searchsorted(self._keys, bounds[:, 1], side="right")
+        slices = [self._order[s:e] for s, e in zip(starts, ends) if e > s]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def distances_from(self, lat: float, lon: float) -> np.ndarray:
+        """计算指定点到所有充电站的距离（公里）"""
+        return haversine_one_to_many(math.radians(lat), math.radians(lon), self.lats, self.lons)
+
+    def within_radius(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        sort: bool = True
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        查询半径内的充电站
+        返回（下标数组, 距离数组），sort 为 True 时按距离升序排列
+        """
+        if len(self) == 0 or radius_km < 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        candidates = self._candidates(lat, lon, radius_km)
+        distances = haversine_one_to_many(
+            math.radians(lat),
+            math.radians(lon),
+            self.lats[candidates],
+            self.lons[candidates]
+        )
+        mask = distances <= radius_km
+        candidates = candidates[mask]
+        distances = distances[mask]
+        if not sort:
+            return candidates, distances
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """查询最近的 k 个充电站，返回按距离升序排列的（下标数组, 距离数组）"""
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        # 逐步扩大搜索半径，半径内的结果一定包含最近的 k 个
+        radius = self.cell_deg * 111.0
+        max_radius = math.pi * EARTH_RADIUS_KM
+        while True:
+            indices, distances = self.within_radius(lat, lon, radius)
+            if len(indices) >= k or radius >= max_radius:
+                return indices[:k], distances[:k]
+            radius = min(radius * 2, max_radius)
@@ -0,0 +1,115 @@
+"""
+离线充电站目录文件
+
+目录为一个文件夹，包含：
+- lat.npy / lon.npy：弧度坐标（float64 列存）
+- order.npy / keys.npy：空间索引的网格排序及排序后的网格编号
+- chargers.json：与坐标顺序一致的充电站ID和名称
+- meta.json：充电站数量、网格大小和生成时间
+
+数组以内存映射方式载入，多个工作进程共享同一份物理页，启动时无需解析或重建索引。
+
+从 JSON 导出文件生成目录：
+    python -m app.services.charger_store superchargers.json data/charger_catalog
+"""
+import os
+import json
+import math
+import argparse
+import numpy as np
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Sequence
+from app.services.charger_index import ChargerIndex
+
+ARRAY_NAMES = ("lat", "lon", "order", "keys")
+SIDECAR_FIELDS = ("id", "name")
+
+
+class StoredChargers(Sequence):
+    """按需由附属文件和坐标数组生成充电站记录，附属文件在首次访问时才载入"""
+
+    def __init__(self, sidecar_path: str, lats: np.ndarray, lons: np.ndarray):
+        self.sidecar_path = sidecar_path
+        self.lats = lats
+        self.lons = lons
+        self._records: Optional[List[Dict[str, Any]]] = None
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if self._records is None:
+            with open(self.sidecar_path, encoding="utf-8") as f:
+                self._records = json.load(f)
+        charger = dict(self._records[i])
+        charger["location"] = {
+            "lat": math.degrees(float(self.lats[i])),
+            "lon": math.degrees(float(self.lons[i]))
+        }
+        return charger
+
+
+def build_charger_store(chargers: List[Dict[str, Any]], directory: str, cell_deg: float = 1.0) -> int:
+    """将充电站列表写入离线目录，返回写入的充电站数量"""
+    index = ChargerIndex.from_chargers(chargers, cell_deg)
+    os.makedirs(directory, exist_ok=True)
+
+    for name, array in index.to_arrays().items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+
+    sidecar = [{field: charger.get(field) for field in SIDECAR_FIELDS} for charger in index.chargers]
+    with open(os.path.join(directory, "chargers.json"), "w", encoding="utf-8") as f:
+        json.dump(sidecar, f, ensure_ascii=False)
+
+    meta = {
+        "count": len(index),
+        "cell_deg": cell_deg,
+        "built_at": datetime.utcnow().isoformat()
+    }
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return len(index)
+
+
+def load_charger_store(directory: str) -> ChargerIndex:
+    """以内存映射方式载入离线目录，返回可直接用于路线规划的空间索引"""
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+
+    arrays = {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r").view(np.ndarray)
+        for name in ARRAY_NAMES
+    }
+    if any(len(array) != meta["count"] for array in arrays.values()):
+        raise ValueError(f"Charger catalog at {directory} is inconsistent with its metadata")
+
+    chargers = StoredChargers(os.path.join(directory, "chargers.json"), arrays["lat"], arrays["lon"])
+    return ChargerIndex.from_arrays(
+        arrays["lat"],
+        arrays["lon"],
+        arrays["order"],
+        arrays["keys"],
+        chargers,
+        meta["cell_deg"]
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build an offline supercharger catalog from a JSON dump")
+    parser.add_argument("source", help="JSON dump: a charger list or an upstream response with a 'response' list")
+    parser.add_argument("directory", help="output directory")
+    parser.add_argument("--cell-deg", type=float, default=1.0, help="spatial index grid size in degrees")
+    args = parser.parse_args(argv)
+
+    with open(args.source, encoding="utf-8") as f:
+        data = json.load(f)
+    chargers = data.get("response", []) if isinstance(data, dict) else data
+
+    count = build_charger_store(chargers, args.directory, args.cell_deg)
+    print(f"Wrote {count} chargers to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+本地数字高程模型（DEM）
+
+从目录中按 1°×1° 瓦片读取高程，瓦片文件按西南角命名（如 N37W122.hgt）：
+- .hgt：SRTM 格式，大端 int16 方形网格（1201×1201 或 3601×3601），自北向南逐行存储，-32768 表示无数据
+- .npy：同样布局的二维数组，可由 GeoTIFF 等格式转换得到
+
+瓦片以内存映射方式打开，只有实际访问到的页才会载入内存；打开的瓦片按最近使用保留
+max_tiles 个，瓦片缓存加锁，可在多个线程中同时查询。高程查询为向量化双线性插值，不访问网络。
+"""
+import os
+import math
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Sequence, Tuple
+from app.services.geo import polyline_distances, interpolate_polyline
+
+TILE_SUFFIXES = (".hgt", ".npy")
+HGT_VOID = -32768
+
+
+def tile_name(lat: int, lon: int) -> str:
+    """瓦片西南角（整数度）对应的文件名，不含扩展名"""
+    return f"{'N' if lat >= 0 else 'S'}{abs(lat):02d}{'E' if lon >= 0 else 'W'}{abs(lon):03d}"
+
+
+class ElevationModel:
+    """按瓦片内存映射的高程模型"""
+
+    def __init__(self, directory: str, max_tiles: int = 64, sample_interval_km: float = 0.2, max_samples: int = 5000):
+        self.directory = directory
+        self.max_tiles = max_tiles
+        self.sample_interval_km = sample_interval_km
+        self.max_samples = max_samples
+        # 缺失的瓦片同样缓存为 None，避免重复查找文件
+        self._tiles: "OrderedDict[Tuple[int, int], Optional[np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def _open_tile(self, lat: int, lon: int) -> Optional[np.ndarray]:
+        name = tile_name(lat, lon)
+        for suffix in TILE_SUFFIXES:
+            path = os.path.join(self.directory, name + suffix)
+            if not os.path.exists(path):
+                continue
+            if suffix == ".npy":
+                grid = np.load(path, mmap_mode="r")
+            else:
+                file_size = os.path.getsize(path)
+                size = math.isqrt(file_size // 2)
+                if size * size * 2 != file_size:
+                    raise ValueError(f"Invalid elevation tile {path}: {file_size} bytes is not a square int16 grid")
+                grid = np.memmap(path, dtype=">i2", mode="r", shape=(size, size))
+            if grid.ndim != 2 or min(grid.shape) < 2:
+                raise ValueError(f"Invalid elevation tile {path}")
+            self.loads += 1
+            return grid
+        return None
+
+    def tile(self, lat: int, lon: int) -> Optional[np.ndarray]:
+        """获取西南角为 (lat, lon) 的瓦片，不存在时返回 None"""
+        key = (lat, lon)
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                return self._tiles[key]
+            # 打开瓦片只映射文件，持锁进行可避免同一瓦片被重复打开
+            grid = self._open_tile(lat, lon)
+            self._tiles[key] = grid
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+                self.evictions += 1
+            return grid
+
+    def elevations(self, lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+        """各点（度）的高程（米），没有瓦片或无数据的点为 NaN"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        result = np.full(lats.shape, np.nan)
+        if lats.size == 0:
+            return result
+
+        tile_lats = np.floor(lats).astype(np.int64)
+        tile_lons = np.floor(lons).astype(np.int64)
+        keys = tile_lats * 360 + tile_lons
+        unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        for i in range(len(unique_keys)):
+            grid = self.tile(int(tile_lats.flat[first[i]]), int(tile_lons.flat[first[i]]))
+            if grid is None:
+                continue
+            mask = inverse.reshape(lats.shape) == i
+            result[mask] = self._bilinear(
+                grid,
+                lats[mask] - tile_lats[mask],
+                lons[mask] - tile_lons[mask]
+            )
+        return result
+
+    def _bilinear(self, grid: np.ndarray, lat_offsets: np.ndarray, lon_offsets: np.ndarray) -> np.ndarray:
+        """瓦片内双线性插值，偏移量为相对西南角的度数（0-1）"""
+        rows, cols = grid.shape
+        # 首行对应瓦片北边界
+        row = (1.0 - lat_offsets) * (rows - 1)
+        col = lon_offsets * (cols - 1)
+        r0 = np.clip(np.floor(row).astype(np.intp), 0, rows - 2)
+        c0 = np.clip(np.floor(col).astype(np.intp), 0, cols - 2)
+        fr = row - r0
+        fc = col - c0
+
+        corners = [grid[r0 + dr, c0 + dc].astype(np.float64) for dr in (0, 1) for dc in (0, 1)]
+        if grid.dtype.kind == "i":
+            for corner in corners:
+                corner[corner == HGT_VOID] = np.nan
+        top_left, top_right, bottom_left, bottom_right = corners
+        top = top_left + (top_right - top_left) * fc
+        bottom = bottom_left + (bottom_right - bottom_left) * fc
+        return top + (bottom - top) * fr
+
+    def profile(self, lats: Sequence[float], lons: Sequence[float]) -> Optional[Dict[str, Any]]:
+        """
+        沿折线按 sample_interval_km 采样（另含各顶点），统计起终点高程、累计爬升和下降（米）
+        超过 max_samples 时自动放大采样间隔；没有任何高程数据时返回 None
+        """
+        if len(lats) < 2:
+            return None
+        cumulative = polyline_distances(lats, lons)
+        total = float(cumulative[-1])
+        count = min(max(int(math.ceil(total / self.sample_interval_km)) + 1, 2), self.max_samples)
+        distances = np.union1d(np.linspace(0.0, total, count), cumulative)
+        sample_lats, sample_lons = interpolate_polyline(lats, lons, cumulative, distances)
+
+        heights = self.elevations(sample_lats, sample_lons)
+        valid = heights[np.isfinite(heights)]
+        if valid.size == 0:
+            return None
+        steps = np.diff(valid)
+        return {
+            "start_elevation": float(valid[0]),
+            "end_elevation": float(valid[-1]),
+            "elevation_change": float(valid[-1] - valid[0]),
+            "climb": float(np.maximum(steps, 0).sum()),
+            "descent": float(np.maximum(-steps, 0).sum()),
+            "samples": len(distances),
+            "coverage": valid.size / len(distances)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            open_tiles = sum(grid is not None for grid in self._tiles.values())
+        return {
+            "directory": self.directory,
+            "open_tiles": open_tiles,
+            "max_tiles": self.max_tiles,
+            "loads": self.loads,
+            "evictions": self.evictions
+        }
+
+
+_elevation_model: Optional[ElevationModel] = None
+_elevation_loaded = False
+
+
+def get_elevation_model() -> Optional[ElevationModel]:
+    """
+    进程内共享的高程模型，瓦片目录由 DEM_TILE_DIR 指定，未配置时返回 None
+    """
+    global _elevation_model, _elevation_loaded
+    if not _elevation_loaded:
+        directory = os.getenv("DEM_TILE_DIR")
+        if directory:
+            _elevation_model = ElevationModel(
+                directory,
+                max_tiles=int(os.getenv("DEM_MAX_OPEN_TILES", "64")),
+                sample_interval_km=float(os.getenv("DEM_SAMPLE_INTERVAL_KM", "0.2")),
+                max_samples=int(os.getenv("DEM_MAX_SAMPLES", "5000"))
+            )
+        _elevation_loaded = True
+    return _elevation_model
@@ -0,0 +1,64 @@
+import numpy as np
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+FORECAST_FIELDS = ("temp", "humidity", "wind_speed")
+
+
+class ForecastSeries:
+    """
+    单个网格的天气预报时间序列
+
+    将 OpenWeather 预报（5 天、每 3 小时一条）转换为按时间排序的 float64 数组，
+    可对任意时刻做线性插值，不再需要请求上游。
+    """
+
+    __slots__ = ("times", "values", "raw")
+
+    def __init__(self, times: np.ndarray, values: Dict[str, np.ndarray], raw: Dict[str, Any]):
+        self.times = times
+        self.values = values
+        self.raw = raw
+
+    @classmethod
+    def from_forecast(cls, data: Dict[str, Any]) -> Optional["ForecastSeries"]:
+        """由预报接口返回的数据构建，没有可用条目时返回 None"""
+        entries = sorted(
+            (entry for entry in data.get("list", []) if entry.get("dt") is not None),
+            key=lambda entry: entry["dt"]
+        )
+        if not entries:
+            return None
+
+        times = np.array([entry["dt"] for entry in entries], dtype=np.float64)
+        values = {
+            "temp": np.array([entry.get("main", {}).get("temp", np.nan) for entry in entries], dtype=np.float64),
+            "humidity": np.array([entry.get("main", {}).get("humidity", np.nan) for entry in entries], dtype=np.float64),
+            "wind_speed": np.array([entry.get("wind", {}).get("speed", np.nan) for entry in entries], dtype=np.float64)
+        }
+        return cls(times, values, data)
+
+    @property
+    def start(self) -> float:
+        return float(self.times[0])
+
+    @property
+    def end(self) -> float:
+        return float(self.times[-1])
+
+    def at(self, times: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        插值得到各时刻（Unix 秒）的天气
+        超出预报范围的时刻取最近一条预报的值
+        """
+        return {field: np.interp(times, self.times, values) for field, values in self.values.items()}
+
+
+def parse_time(value: Any) -> float:
+    """将 Unix 秒或 ISO 8601 字符串（未指定时区时视为 UTC）转换为 Unix 秒"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
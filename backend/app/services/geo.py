@@ -0,0 +1,130 @@
+import math
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0  # 地球半径（公里）
+
+
+def to_radians(lats: Sequence[float], lons: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """将经纬度（度）转换为连续存储的 float64 弧度数组"""
+    lats_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lons_rad = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.ascontiguousarray(lats_rad), np.ascontiguousarray(lons_rad)
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """计算两点之间的距离（公里），输入为度"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def haversine_one_to_many(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    计算一个点到一组点的距离（公里）
+    所有输入均为弧度，lats/lons 为 float64 数组
+    """
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    np.clip(a, 0.0, 1.0, out=a)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a, out=a), out=a)
+
+
+def haversine_matrix(
+    lats_a: np.ndarray,
+    lons_a: np.ndarray,
+    lats_b: Optional[np.ndarray] = None,
+    lons_b: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    计算两组点之间的距离矩阵（公里），形状为 (len(a), len(b))
+    所有输入均为弧度；省略 b 时计算 a 内部两两之间的距离
+    """
+    if lats_b is None or lons_b is None:
+        lats_b, lons_b = lats_a, lons_a
+    lat_a = lats_a[:, np.newaxis]
+    lon_a = lons_a[:, np.newaxis]
+    a = np.sin((lats_b - lat_a) / 2) ** 2 + np.cos(lat_a) * np.cos(lats_b) * np.sin((lons_b - lon_a) / 2) ** 2
+    np.clip(a, 0.0, 1.0, out=a)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a, out=a), out=a)
+
+
+def polyline_distances(lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+    """计算折线各顶点距起点的累计距离（公里），输入为度"""
+    lats_rad, lons_rad = to_radians(lats, lons)
+    a = (
+        np.sin(np.diff(lats_rad) / 2) ** 2
+        + np.cos(lats_rad[:-1]) * np.cos(lats_rad[1:]) * np.sin(np.diff(lons_rad) / 2) ** 2
+    )
+    np.clip(a, 0.0, 1.0, out=a)
+    segments = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+    return np.concatenate(([0.0], np.cumsum(segments)))
+
+
+def interpolate_polyline(
+    lats: Sequence[float],
+    lons: Sequence[float],
+    cumulative: np.ndarray,
+    distances: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    返回折线上距起点 distances 公里处的点的经纬度（度）
+    cumulative 为 polyline_distances 的结果；顶点之间按经纬度线性插值
+    """
+    return (
+        np.interp(distances, cumulative, np.asarray(lats, dtype=np.float64)),
+        np.interp(distances, cumulative, np.asarray(lons, dtype=np.float64))
+    )
+
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 5) -> str:
+    """计算经纬度（度）所在的 geohash 网格编码，precision 为编码长度"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        # 偶数位二分经度，奇数位二分纬度
+        target, bounds = (lon, lon_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if target >= mid:
+            value = value * 2 + 1
+            bounds[0] = mid
+        else:
+            value = value * 2
+            bounds[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """返回 geohash 网格的范围 (lat_min, lon_min, lat_max, lon_max)"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lon_range if even else lat_range
+            mid = (bounds[0] + bounds[1]) / 2
+            if (value >> shift) & 1:
+                bounds[0] = mid
+            else:
+                bounds[1] = mid
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def geohash_center(geohash: str) -> Tuple[float, float]:
+    """返回 geohash 网格中心点的经纬度（度）"""
+    lat_min, lon_min, lat_max, lon_max = geohash_bounds(geohash)
+    return (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
@@ -1,8 +1,200 @@
-from typing import Dict, Any, List
+import os
+from typing import Dict, Any, List, Optional, Sequence, Iterable, Iterator
+from itertools import islice
 import numpy as np
+from app.services.weather_impact import weather_impact
+from app.services.vehicle_efficiency import VehicleEfficiencyStore
+from app.services.elevation import get_elevation_model
+
+BATCH_REQUIRED_COLUMNS = ("current_charge", "battery_capacity", "max_range", "distance")
+TELEMETRY_REQUIRED_COLUMNS = ("distance", "energy_used")
+LOW_CHARGE_PERCENTAGE = 20  # 低于该剩余电量百分比时需要充电
+SEGMENT_CHUNK_SIZE = 4096  # 分段输入按块读取，长路线无需整体载入内存
+GRAVITY = 9.81  # 重力加速度（m/s²）
+DRIVETRAIN_EFFICIENCY = 0.9  # 爬坡时电池能量转化为势能的效率
+TERRAIN_REGEN_EFFICIENCY = 0.6  # 下坡时势能经动能回收返还电池的比例
+PASSENGER_MASS_KG = 75  # 每位乘员的质量
+DEFAULT_VEHICLE_MASS_KG = 2000
+# 不同车型的整备质量（kg）
+MODEL_MASS_KG = {
+    "Model Y": 2000,
+    "Model 3": 1850,
+    "Model S": 2150,
+    "Model X": 2450
+}
+
+# 不确定性估计中可随机抽样的输入因素及其取值范围
+UNCERTAIN_FACTORS = {
+    "temp": (None, None),
+    "humidity": (0, 100),
+    "wind_speed": (0, None),
+    "passengers": (1, None),
+    "cargo_weight": (0, None),
+    "distance": (0, None),
+    "elevation_change": (None, None)
+}
+# 未指定分布时，天气因素按正态分布抽样（均值为输入值）
+DEFAULT_DISTRIBUTIONS = {
+    "temp": {"dist": "normal", "std": 2.0},
+    "humidity": {"dist": "normal", "std": 5.0},
+    "wind_speed": {"dist": "normal", "std": 2.0}
+}
+UNCERTAINTY_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class SegmentEnergyModel:
+    """
+    按路段累计能耗和剩余电量
+
+    路段分块加入，每块内用向量化累加计算各路段结束时的剩余电量，记录首个
+    低于需充电阈值和首个耗尽电量的路段；只保存汇总状态，与路段数量无关。
+    owner 为当前用户，用于查找该用户车辆学习到的效率系数。
+    每个路段包含 distance（公里）和 elevation_change（米），可选 temp、humidity、
+    wind_speed 或嵌套的 weather 字典，缺省时使用整条路线的天气。
+    地形能耗按各路段高差逐段累加（见 RangeAnxietyService._calculate_terrain_energy），
+    同向高差的路线无论如何分段，总能耗都与整段计算一致。
+    """
+
+    def __init__(
+        self,
+        service: "RangeAnxietyService",
+        vehicle_data: Dict[str, Any],
+        weather_data: Dict[str, Any],
+        owner: Optional[str] = None
+    ):
+        self.service = service
+        self.battery_capacity = vehicle_data.get("battery_capacity", 0)
+        self.current_charge = vehicle_data.get("current_charge", 0)
+        self.max_range = vehicle_data.get("max_range", 0)
+        self.load_impact = service._calculate_load_impact(
+            vehicle_data.get("passengers", 1),
+            vehicle_data.get("cargo_weight", 0)
+        )
+        self.model_impact = service._vehicle_model_impact(vehicle_data, owner)
+        self.mass = service._vehicle_mass(
+            vehicle_data.get("model_type", "Model Y"),
+            vehicle_data.get("passengers", 1),
+            vehicle_data.get("cargo_weight", 0)
+        )
+        self.default_weather = (
+            weather_data.get("temp", 20),
+            weather_data.get("humidity", 50),
+            weather_data.get("wind_speed", 0)
+        )
+
+        self.segment_count = 0
+        self.distance = 0.0
+        self.consumption = 0.0
+        self._base = 0.0
+        self._weighted_weather = 0.0
+        self._terrain_energy = 0.0
+        self.min_remaining_percentage = self.current_charge / self.battery_capacity * 100
+        self.first_low_charge: Optional[Dict[str, Any]] = None
+        self.first_depleted: Optional[Dict[str, Any]] = None
+
+    def _weather_column(self, segments: Sequence[Dict[str, Any]], field: str, default: float) -> np.ndarray:
+        values = []
+        for segment in segments:
+            value = segment.get(field)
+            if value is None:
+                value = (segment.get("weather") or {}).get(field)
+            values.append(default if value is None else value)
+        return np.asarray(values, dtype=np.float64)
+
+    def add(self, segments: Sequence[Dict[str, Any]]) -> None:
+        """加入一块路段"""
+        if not segments:
+            return
+
+        distance = np.asarray([segment.get("distance", 0) for segment in segments], dtype=np.float64)
+        elevation_change = np.asarray([segment.get("elevation_change", 0) for segment in segments], dtype=np.float64)
+        temp, humidity, wind_speed = (
+            self._weather_column(segments, field, default)
+            for field, default in zip(("temp", "humidity", "wind_speed"), self.default_weather)
+        )
+
+        base = self.service._calculate_base_consumption(distance, self.max_range, self.battery_capacity)
+        weather = weather_impact(temp, humidity, wind_speed)
+        terrain = self.service._calculate_terrain_energy(
+            self.mass,
+            np.maximum(elevation_change, 0),
+            np.maximum(-elevation_change, 0)
+        )
+        consumption = base * (1 + weather) * (1 + self.load_impact) * self.model_impact + terrain
+
+        # 各路段结束时的累计能耗、行驶距离和剩余电量
+        consumed = self.consumption + np.cumsum(consumption)
+        travelled = self.distance + np.cumsum(distance)
+        remaining = (self.current_charge - consumed) / self.battery_capacity * 100
+
+        if self.first_low_charge is None:
+            self.first_low_charge = self._first_below(remaining, travelled, LOW_CHARGE_PERCENTAGE)
+        if self.first_depleted is None:
+            self.first_depleted = self._first_below(remaining, travelled, 0)
+
+        self.segment_count += len(segments)
+        self.distance = float(travelled[-1])
+        self.consumption = float(consumed[-1])
+        self.min_remaining_percentage = min(self.min_remaining_percentage, float(remaining.min()))
+        self._base += float(base.sum())
+        self._weighted_weather += float((base * weather).sum())
+        self._terrain_energy += float(terrain.sum())
+
+    def _first_below(self, remaining: np.ndarray, travelled: np.ndarray, threshold: float) -> Optional[Dict[str, Any]]:
+        below = remaining < threshold
+        if not below.any():
+            return None
+        i = int(np.argmax(below))
+        return {
+            "segment": self.segment_count + i,
+            "distance": float(travelled[i]),
+            "remaining_percentage": float(remaining[i])
+        }
+
+    def result(self) -> Dict[str, Any]:
+        """汇总结果，字段与整段计算一致，另含分段信息"""
+        remaining_percentage = (self.current_charge - self.consumption) / self.battery_capacity * 100
+        return {
+            "anxiety_index": self.service._calculate_anxiety_index(remaining_percentage, self.distance, self.max_range),
+            "remaining_percentage": remaining_percentage,
+            "total_consumption": self.consumption,
+            # 分段的天气影响按基础能耗加权平均
+            "weather_impact": self._weighted_weather / self._base if self._base else 0.0,
+            "load_impact": self.load_impact,
+            "terrain_impact": self._terrain_energy / self._base if self._base else 0.0,
+            "terrain_energy": self._terrain_energy,
+            "model_impact": self.model_impact,
+            "needs_charging": remaining_percentage < LOW_CHARGE_PERCENTAGE,
+            "distance": self.distance,
+            "segment_count": self.segment_count,
+            "min_remaining_percentage": self.min_remaining_percentage,
+            "first_low_charge": self.first_low_charge,
+            "first_depleted": self.first_depleted
+        }
+
+
+def iter_chunks(items: Iterable[Any], size: int = SEGMENT_CHUNK_SIZE) -> Iterator[List[Any]]:
+    """将可迭代对象按块读取"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 class RangeAnxietyService:
     def __init__(self):
+        # 不确定性估计的最大样本数
+        self.max_samples = int(os.getenv("RANGE_ANXIETY_MAX_SAMPLES", "100000"))
+        # 根据车辆遥测学习的单车效率系数
+        self.vehicle_efficiency = VehicleEfficiencyStore(
+            max_vehicles=int(os.getenv("VEHICLE_EFFICIENCY_MAX_VEHICLES", "1000")),
+            buffer_size=int(os.getenv("VEHICLE_TELEMETRY_BUFFER_SIZE", "1024")),
+            half_life=float(os.getenv("VEHICLE_EFFICIENCY_HALF_LIFE", "500")),
+            min_samples=int(os.getenv("VEHICLE_EFFICIENCY_MIN_SAMPLES", "20"))
+        )
+        # 本地高程模型，未配置 DEM_TILE_DIR 时为 None
+        self.elevation = get_elevation_model()
         # 不同车型的基础效率系数
         self.model_efficiency = {
             "Model Y": 1.0,  # 基准效率
@@ -14,19 +206,32 @@ class RangeAnxietyService:
     def calculate_range_anxiety(self,
                               vehicle_data: Dict[str, Any],
                               weather_data: Dict[str, Any],
-                              route_data: Dict[str, Any]) -> Dict[str, Any]:
+                              route_data: Dict[str, Any],
+                              uncertainty: Optional[Dict[str, Any]] = None,
+                              owner: Optional[str] = None) -> Dict[str, Any]:
         """
         计算续航焦虑指数
+        给出 owner（当前用户）且 vehicle_data 中的 vehicle_id 已有该用户上传的足够遥测样本时，
+        使用学习到的效率系数代替车型系数；
+        地形能耗由 elevation_change，或累计爬升 climb 和下降 descent 计算；都未给出时由 points
+        经本地高程模型采样得到；
+        route_data 含 segments 时按路段计算，segments 可以是列表或生成器；
+        指定 uncertainty 时另外给出蒙特卡洛抽样的结果分布，见 estimate_uncertainty
         """
+        if route_data.get("segments") is not None:
+            if uncertainty:
+                raise ValueError("uncertainty is not supported for segmented routes")
+            return self.calculate_segmented_range_anxiety(vehicle_data, weather_data, route_data["segments"], owner)
+        route_data, elevation_profile = self._resolve_terrain(route_data)
+
         # 基础参数
         battery_capacity = vehicle_data.get("battery_capacity", 0)
         current_charge = vehicle_data.get("current_charge", 0)
         max_range = vehicle_data.get("max_range", 0)
-        model_type = vehicle_data.get("model_type", "Model Y")
         passengers = vehicle_data.get("passengers", 1)
         cargo_weight = vehicle_data.get("cargo_weight", 0)
         distance = route_data.get("distance", 0)
-        elevation_change = route_data.get("elevation_change", 0)
+        climb, descent = self._climb_descent(route_data)
 
         # 计算基础消耗
         base_consumption = self._calculate_base_consumption(
@@ -39,20 +244,24 @@ class RangeAnxietyService:
         # 计算负载影响
         load_impact = self._calculate_load_impact(passengers, cargo_weight)
 
-        # 计算地形影响
-        terrain_impact = self._calculate_terrain_impact(elevation_change)
-
         # 计算车型效率影响
-        model_impact = self.model_efficiency.get(model_type, 1.0)
+        model_impact = self._vehicle_model_impact(vehicle_data, owner)
+
+        # 计算地形能耗
+        terrain_energy = self._calculate_terrain_energy(
+            self._vehicle_mass(vehicle_data.get("model_type", "Model Y"), passengers, cargo_weight),
+            climb,
+            descent
+        )
+        terrain_impact = terrain_energy / base_consumption if base_consumption else 0.0
 
         # 计算总消耗
         total_consumption = (
             base_consumption *
             (1 + weather_impact) *
             (1 + load_impact) *
-            (1 + terrain_impact) *
             model_impact
-        )
+        ) + terrain_energy
 
         # 计算剩余电量百分比
         remaining_percentage = (current_charge - total_consumption) / battery_capacity * 100
@@ -64,16 +273,383 @@ class RangeAnxietyService:
             max_range
         )
 
-        return {
+        result = {
             "anxiety_index": anxiety_index,
             "remaining_percentage": remaining_percentage,
             "total_consumption": total_consumption,
             "weather_impact": weather_impact,
             "load_impact": load_impact,
             "terrain_impact": terrain_impact,
+            "terrain_energy": terrain_energy,
             "model_impact": model_impact,
-            "needs_charging": remaining_percentage < 20
+            "needs_charging": remaining_percentage < LOW_CHARGE_PERCENTAGE
+        }
+        if elevation_profile is not None:
+            result["elevation_profile"] = elevation_profile
+        if uncertainty:
+            result["uncertainty"] = self.estimate_uncertainty(vehicle_data, weather_data, route_data, uncertainty, owner)
+        return result
+
+    def _resolve_terrain(self, route_data: Dict[str, Any]):
+        """
+        未给出 elevation_change 和 climb 时，由 points 折线经本地高程模型得到累计爬升和下降
+        返回新的 route_data 及高程采样结果（未采样时为 None）
+        """
+        points = route_data.get("points")
+        if (
+            route_data.get("elevation_change") is not None
+            or route_data.get("climb") is not None
+            or not points
+            or self.elevation is None
+        ):
+            return route_data, None
+        profile = self.elevation.profile([p["lat"] for p in points], [p["lon"] for p in points])
+        if profile is None:
+            return route_data, None
+        return {**route_data, "climb": profile["climb"], "descent": profile["descent"]}, profile
+
+    def _climb_descent(self, route_data: Dict[str, Any]):
+        """路线的累计爬升和下降（米），优先使用 elevation_change"""
+        elevation_change = route_data.get("elevation_change")
+        if elevation_change is None and route_data.get("climb") is not None:
+            return route_data["climb"], route_data.get("descent") or 0
+        elevation_change = elevation_change or 0
+        return max(elevation_change, 0), max(-elevation_change, 0)
+
+    def estimate_uncertainty(
+        self,
+        vehicle_data: Dict[str, Any],
+        weather_data: Dict[str, Any],
+        route_data: Dict[str, Any],
+        uncertainty: Dict[str, Any],
+        owner: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        蒙特卡洛估计续航焦虑的不确定性
+
+        uncertainty 形如 {"samples": 10000, "seed": 0, "distributions": {"temp": {"dist": "normal", "std": 3}}}；
+        可抽样的因素见 UNCERTAIN_FACTORS，分布支持 normal（mean、std）、uniform（low、high）、
+        triangular（low、mode、high），未给出的均值或众数取输入值。所有样本一次向量化计算，
+        相同 seed 得到相同结果
+        """
+        samples = int(uncertainty.get("samples", 1000))
+        if not 1 <= samples <= self.max_samples:
+            raise ValueError(f"samples must be between 1 and {self.max_samples}")
+        seed = uncertainty.get("seed", 0)
+        rng = np.random.default_rng(seed)
+
+        inputs = {
+            "temp": weather_data.get("temp", 20),
+            "humidity": weather_data.get("humidity", 50),
+            "wind_speed": weather_data.get("wind_speed", 0),
+            "passengers": vehicle_data.get("passengers", 1),
+            "cargo_weight": vehicle_data.get("cargo_weight", 0),
+            "distance": route_data.get("distance", 0)
+        }
+        distributions = {**DEFAULT_DISTRIBUTIONS, **(uncertainty.get("distributions") or {})}
+        unknown = set(distributions) - set(UNCERTAIN_FACTORS)
+        if unknown:
+            raise ValueError(f"Unknown uncertain factors: {', '.join(sorted(unknown))}")
+        # 只给出累计爬升和下降时地形按常量计算
+        terrain_columns = {}
+        if route_data.get("elevation_change") is None and route_data.get("climb") is not None:
+            if "elevation_change" in distributions:
+                raise ValueError("elevation_change cannot be sampled when climb/descent are given")
+            climb, descent = self._climb_descent(route_data)
+            terrain_columns = {
+                "climb": np.full(samples, climb, dtype=np.float64),
+                "descent": np.full(samples, descent, dtype=np.float64)
+            }
+        else:
+            inputs["elevation_change"] = route_data.get("elevation_change") or 0
+
+        columns = {
+            "current_charge": np.full(samples, vehicle_data.get("current_charge", 0), dtype=np.float64),
+            "battery_capacity": np.full(samples, vehicle_data.get("battery_capacity", 0), dtype=np.float64),
+            "max_range": np.full(samples, vehicle_data.get("max_range", 0), dtype=np.float64)
+        }
+        for factor, value in inputs.items():
+            spec = distributions.get(factor)
+            if spec is None:
+                columns[factor] = np.full(samples, value, dtype=np.float64)
+                continue
+            low, high = UNCERTAIN_FACTORS[factor]
+            sampled = self._sample(rng, spec, value, samples)
+            if low is not None or high is not None:
+                np.clip(sampled, low, high, out=sampled)
+            columns[factor] = sampled
+
+        columns.update(terrain_columns)
+        columns["model_type"] = np.full(samples, vehicle_data.get("model_type", "Model Y"))
+        columns["model_impact"] = np.full(samples, self._vehicle_model_impact(vehicle_data, owner))
+
+        results = self.calculate_range_anxiety_batch(columns)
+
+        remaining = results["remaining_percentage"]
+        anxiety = results["anxiety_index"]
+        return {
+            "samples": samples,
+            "seed": seed,
+            "remaining_percentage": self._describe(remaining),
+            "anxiety_index": self._describe(anxiety),
+            "needs_charging_probability": float(results["needs_charging"].mean()),
+            "depletion_probability": float((remaining < 0).mean())
+        }
+
+    def _sample(self, rng: np.random.Generator, spec: Dict[str, Any], value: float, size: int) -> np.ndarray:
+        dist = spec.get("dist", "normal")
+        if dist == "normal":
+            return rng.normal(spec.get("mean", value), spec.get("std", 0.0), size)
+        if dist == "uniform":
+            return rng.uniform(spec.get("low", value), spec.get("high", value), size)
+        if dist == "triangular":
+            return rng.triangular(spec.get("low", value), spec.get("mode", value), spec.get("high", value), size)
+        raise ValueError(f"Unknown distribution {dist!r}")
+
+    def _describe(self, values: np.ndarray) -> Dict[str, float]:
+        summary = {
+            f"p{p}": float(v)
+            for p, v in zip(UNCERTAINTY_PERCENTILES, np.percentile(values, UNCERTAINTY_PERCENTILES))
         }
+        summary["mean"] = float(values.mean())
+        summary["std"] = float(values.std())
+        return summary
+
+    def effective_range(
+        self,
+        vehicle_data: Dict[str, Any],
+        weather_data: Dict[str, Any],
+        owner: Optional[str] = None
+    ) -> float:
+        """
+        按天气、负载和车辆效率系数折算后的续航里程（公里）
+        路线规划使用该里程时，各段规划的耗电与 calculate_range_anxiety 的行驶能耗（不含地形）一致
+        """
+        factor = (
+            (1 + self._calculate_weather_impact(weather_data)) *
+            (1 + self._calculate_load_impact(vehicle_data.get("passengers", 1), vehicle_data.get("cargo_weight", 0))) *
+            self._vehicle_model_impact(vehicle_data, owner)
+        )
+        max_range = vehicle_data.get("max_range", 0)
+        return max_range / factor if factor > 0 else max_range
+
+    def calculate_trip_range_anxiety(
+        self,
+        vehicle_data: Dict[str, Any],
+        weather_data: Dict[str, Any],
+        legs: Sequence[Dict[str, Any]],
+        owner: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        按路线规划结果的各段计算续航焦虑
+        第一段从当前电量出发，之后每段从充电站按规划的出发电量（departure_battery）出发；
+        汇总字段取第一段（到达首个充电站或终点）的结果，legs 为各段结果
+        """
+        results = []
+        for i, leg in enumerate(legs):
+            leg_vehicle = vehicle_data
+            if i > 0:
+                leg_vehicle = dict(
+                    vehicle_data,
+                    current_charge=vehicle_data.get("battery_capacity", 0) * leg["departure_battery"] / 100
+                )
+            route_data = {"distance": leg["distance"]}
+            if leg.get("climb") is not None:
+                route_data.update(climb=leg["climb"], descent=leg.get("descent", 0))
+            results.append(self.calculate_range_anxiety(leg_vehicle, weather_data, route_data, owner=owner))
+
+        trip = dict(results[0])
+        trip["charging_stops"] = len(results) - 1
+        # 需要途中充电时即视为需要充电
+        trip["needs_charging"] = trip["needs_charging"] or len(results) > 1
+        trip["max_anxiety_index"] = max(result["anxiety_index"] for result in results)
+        trip["legs"] = results
+        return trip
+
+    def calculate_segmented_range_anxiety(
+        self,
+        vehicle_data: Dict[str, Any],
+        weather_data: Dict[str, Any],
+        segments: Iterable[Dict[str, Any]],
+        owner: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """按路段计算续航焦虑指数及沿途剩余电量"""
+        model = SegmentEnergyModel(self, vehicle_data, weather_data, owner)
+        for chunk in iter_chunks(segments):
+            model.add(chunk)
+        return model.result()
+
+    def calculate_range_anxiety_batch(self, columns: Dict[str, Sequence[Any]]) -> Dict[str, np.ndarray]:
+        """
+        批量计算续航焦虑指数
+        columns 为列存输入，每列长度相同：current_charge、battery_capacity、max_range、distance 必填，
+        passengers、cargo_weight、elevation_change、temp、humidity、wind_speed、model_type 可选，
+        缺省值与单次计算一致；给出 model_impact 列时直接使用该效率系数，不再按车型查表；
+        给出 climb、descent 列时按累计爬升和下降计算地形能耗，代替 elevation_change。
+        返回与 calculate_range_anxiety 字段相同的列
+        """
+        missing = [name for name in BATCH_REQUIRED_COLUMNS if name not in columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        size = len(columns["current_charge"])
+        if any(len(values) != size for values in columns.values()):
+            raise ValueError("All columns must have the same length")
+
+        def column(name: str, default: float) -> np.ndarray:
+            if name not in columns:
+                return np.full(size, default, dtype=np.float64)
+            return np.asarray(columns[name], dtype=np.float64)
+
+        battery_capacity = column("battery_capacity", 0)
+        current_charge = column("current_charge", 0)
+        max_range = column("max_range", 0)
+        distance = column("distance", 0)
+        if np.any(battery_capacity <= 0) or np.any(max_range <= 0):
+            raise ValueError("battery_capacity and max_range must be positive")
+
+        base_consumption = self._calculate_base_consumption(distance, max_range, battery_capacity)
+        weather_impacts = weather_impact(column("temp", 20), column("humidity", 50), column("wind_speed", 0))
+        load_impact = self._calculate_load_impact(column("passengers", 1), column("cargo_weight", 0))
+        if "model_impact" in columns:
+            model_impact = column("model_impact", 1.0)
+        else:
+            model_impact = self._model_impact(columns.get("model_type"), size)
+
+        if "climb" in columns or "descent" in columns:
+            climb, descent = column("climb", 0), column("descent", 0)
+        else:
+            elevation_change = column("elevation_change", 0)
+            climb, descent = np.maximum(elevation_change, 0), np.maximum(-elevation_change, 0)
+        mass = (
+            self._model_lookup(columns.get("model_type"), size, MODEL_MASS_KG, DEFAULT_VEHICLE_MASS_KG)
+            + column("passengers", 1) * PASSENGER_MASS_KG
+            + column("cargo_weight", 0)
+        )
+        terrain_energy = self._calculate_terrain_energy(mass, climb, descent)
+        terrain_impact = np.divide(
+            terrain_energy, base_consumption,
+            out=np.zeros(size), where=base_consumption != 0
+        )
+
+        total_consumption = (
+            base_consumption *
+            (1 + weather_impacts) *
+            (1 + load_impact) *
+            model_impact
+        ) + terrain_energy
+        remaining_percentage = (current_charge - total_consumption) / battery_capacity * 100
+
+        return {
+            "anxiety_index": self._calculate_anxiety_index(remaining_percentage, distance, max_range),
+            "remaining_percentage": remaining_percentage,
+            "total_consumption": total_consumption,
+            "weather_impact": weather_impacts,
+            "load_impact": load_impact,
+            "terrain_impact": terrain_impact,
+            "terrain_energy": terrain_energy,
+            "model_impact": model_impact,
+            "needs_charging": remaining_percentage < LOW_CHARGE_PERCENTAGE
+        }
+
+    def ingest_telemetry(
+        self,
+        owner: str,
+        vehicle_id: str,
+        battery_capacity: float,
+        max_range: float,
+        columns: Dict[str, Sequence[float]],
+        model_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        加入 owner（当前用户）车辆的遥测样本并增量更新该车的效率系数
+        columns 为列存样本：distance（公里）、energy_used（kWh）必填，temp、humidity、wind_speed、
+        elevation_change、passengers、cargo_weight 可选；距离不为正、能耗为负或含非数值的样本会被丢弃。
+        每条样本扣除地形能耗后，与效率系数为 1 时的模型预测行驶能耗做在线最小二乘；
+        model_type 用于估计车辆质量
+        """
+        missing = [name for name in TELEMETRY_REQUIRED_COLUMNS if name not in columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        size = len(columns["distance"])
+        if any(len(values) != size for values in columns.values()):
+            raise ValueError("All columns must have the same length")
+        if battery_capacity <= 0 or max_range <= 0:
+            raise ValueError("battery_capacity and max_range must be positive")
+
+        def column(name: str, default: float) -> np.ndarray:
+            if name not in columns:
+                return np.full(size, default, dtype=np.float64)
+            return np.asarray(columns[name], dtype=np.float64)
+
+        distance = column("distance", 0)
+        energy_used = column("energy_used", 0)
+        passengers = column("passengers", 1)
+        cargo_weight = column("cargo_weight", 0)
+        elevation_change = column("elevation_change", 0)
+        expected = (
+            self._calculate_base_consumption(distance, max_range, battery_capacity) *
+            (1 + weather_impact(column("temp", 20), column("humidity", 50), column("wind_speed", 0))) *
+            (1 + self._calculate_load_impact(passengers, cargo_weight))
+        )
+        terrain_energy = self._calculate_terrain_energy(
+            self._vehicle_mass(model_type, passengers, cargo_weight),
+            np.maximum(elevation_change, 0),
+            np.maximum(-elevation_change, 0)
+        )
+
+        valid = (
+            (distance > 0) & (energy_used >= 0)
+            & np.isfinite(expected) & np.isfinite(energy_used) & np.isfinite(terrain_energy)
+        )
+        accepted = int(valid.sum())
+        if accepted:
+            if accepted < size:
+                distance, energy_used = distance[valid], energy_used[valid]
+                expected, terrain_energy = expected[valid], terrain_energy[valid]
+            self.vehicle_efficiency.update(owner, vehicle_id, expected, energy_used, distance, terrain_energy)
+
+        return {
+            "vehicle_id": str(vehicle_id),
+            "accepted": accepted,
+            "rejected": size - accepted,
+            **(self.vehicle_efficiency.describe(owner, vehicle_id) or {"efficiency_factor": None, "samples": 0, "active": False})
+        }
+
+    def _vehicle_model_impact(self, vehicle_data: Dict[str, Any], owner: Optional[str] = None) -> float:
+        """车辆的效率系数：优先使用 owner 为该车学习到的单车系数，否则按车型查表"""
+        learned = self.vehicle_efficiency.coefficient(owner, vehicle_data.get("vehicle_id"))
+        if learned is not None:
+            return learned
+        return self.model_efficiency.get(vehicle_data.get("model_type", "Model Y"), 1.0)
+
+    def _model_impact(self, model_types: Optional[Sequence[str]], size: int) -> np.ndarray:
+        """按车型查表得到效率系数，未知车型为 1.0"""
+        return self._model_lookup(model_types, size, self.model_efficiency, 1.0)
+
+    def _model_lookup(
+        self,
+        model_types: Optional[Sequence[str]],
+        size: int,
+        table: Dict[str, float],
+        default: float
+    ) -> np.ndarray:
+        """按车型查表，未给出车型列时按 Model Y 计算"""
+        if model_types is None:
+            return np.full(size, table.get("Model Y", default), dtype=np.float64)
+        # 车型种类很少，逐个车型比较比排序去重更快
+        model_types = np.asarray(model_types, dtype=str)
+        values = np.full(size, default, dtype=np.float64)
+        for name, value in table.items():
+            values[model_types == name] = value
+        return values
+
+    def _vehicle_mass(self, model_type: Optional[str], passengers, cargo_weight):
+        """车辆总质量（kg）：整备质量加乘员和货物"""
+        return (
+            MODEL_MASS_KG.get(model_type or "Model Y", DEFAULT_VEHICLE_MASS_KG)
+            + passengers * PASSENGER_MASS_KG
+            + cargo_weight
+        )
 
     def _calculate_base_consumption(self, distance: float, max_range: float, battery_capacity: float) -> float:
         """计算基础电量消耗"""
@@ -81,30 +657,11 @@ class RangeAnxietyService:
 
     def _calculate_weather_impact(self, weather_data: Dict[str, Any]) -> float:
         """计算天气影响"""
-        temp = weather_data.get("temp", 20)
-        humidity = weather_data.get("humidity", 50)
-        wind_speed = weather_data.get("wind_speed", 0)
-
-        impact = 0.0
-        # 温度影响
-        if temp < 0:
-            impact += 0.3
-        elif temp < 10:
-            impact += 0.2
-        elif temp > 30:
-            impact += 0.15
-
-        # 湿度影响
-        if humidity > 80:
-            impact += 0.1
-
-        # 风速影响
-        if wind_speed > 20:
-            impact += 0.2
-        elif wind_speed > 10:
-            impact += 0.1
-
-        return impact
+        return weather_impact(
+            weather_data.get("temp", 20),
+            weather_data.get("humidity", 50),
+            weather_data.get("wind_speed", 0)
+        )
 
     def _calculate_load_impact(self, passengers: int, cargo_weight: float) -> float:
         """计算负载影响"""
@@ -112,21 +669,23 @@ class RangeAnxietyService:
         cargo_impact = (cargo_weight / 100) * 0.1
         return passenger_impact + cargo_impact
 
-    def _calculate_terrain_impact(self, elevation_change: float) -> float:
-        """计算地形影响"""
-        return abs(elevation_change) * 0.001
+    def _calculate_terrain_energy(self, mass, climb, descent):
+        """
+        计算地形能耗（kWh），参数可以是标量或数组
+        爬升按 m·g·Δh 除以传动效率消耗电量，下降按 TERRAIN_REGEN_EFFICIENCY 回收，结果可为负
+        """
+        return mass * GRAVITY * (climb / DRIVETRAIN_EFFICIENCY - TERRAIN_REGEN_EFFICIENCY * descent) / 3.6e6
 
-    def _calculate_anxiety_index(self, remaining_percentage: float, distance: float, max_range: float) -> float:
-        """计算焦虑指数"""
+    def _calculate_anxiety_index(self, remaining_percentage, distance, max_range):
+        """计算焦虑指数，参数可以是标量或数组"""
         # 基于剩余电量和距离计算基础焦虑
-        base_anxiety = 100 * (1 - (remaining_percentage / 100))
-        
+        base_anxiety = 100 * (1 - (np.asarray(remaining_percentage, dtype=np.float64) / 100))
+
         # 如果剩余电量不足以到达目的地，增加焦虑
-        if remaining_percentage < (distance / max_range * 100):
-            base_anxiety += 30
+        base_anxiety = base_anxiety + np.where(remaining_percentage < (distance / max_range * 100), 30, 0)
 
         # 如果剩余电量低于20%，显著增加焦虑
-        if remaining_percentage < 20:
-            base_anxiety += 40
+        base_anxiety = base_anxiety + np.where(remaining_percentage < LOW_CHARGE_PERCENTAGE, 40, 0)
 
-        return min(base_anxiety, 100) 
\ No newline at end of file
+        anxiety = np.minimum(base_anxiety, 100)
+        return float(anxiety) if anxiety.ndim == 0 else anxiety
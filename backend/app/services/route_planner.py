@@ -0,0 +1,237 @@
+import heapq
+import math
+import numpy as np
+from typing import Dict, Any, Optional, Sequence
+from app.services.charger_index import ChargerIndex
+from app.services.elevation import ElevationModel
+from app.services.geo import haversine, haversine_one_to_many
+
+
+FEASIBILITY_TOLERANCE = 1e-6  # 校验到达电量时允许的浮点误差（百分比）
+
+
+def reachable_distance(battery: float, max_range: float, reserve: float = 0.0) -> float:
+    """按线性能耗模型计算在保留 reserve 电量的前提下可行驶的距离（公里）"""
+    return (battery - reserve) / 100 * max_range
+
+
+def arrival_battery(departure: float, distance, max_range: float):
+    """行驶 distance 公里后的剩余电量（百分比），distance 可以是数组"""
+    return departure - distance / max_range * 100
+
+
+class ChargingRoutePlanner:
+    """
+    基于充电站图的充电路线规划（A* 搜索）
+
+    充电站为图节点，只有出发电量可达范围内的两点之间才有边。边权为行驶距离，
+    或行驶时间加充电时间；启发函数由到终点的大圆距离推导，始终不高估剩余代价。
+    提供高程模型时，结果中的每段路程另含沿途累计爬升和下降。
+    """
+
+    OBJECTIVES = ("time", "distance")
+
+    def __init__(
+        self,
+        index: ChargerIndex,
+        avg_speed_kmh: float = 90.0,
+        charge_speed_kmh: float = 500.0,
+        stop_overhead_hours: float = 0.1,
+        elevation: Optional[ElevationModel] = None
+    ):
+        self.index = index
+        self.elevation = elevation
+        self.avg_speed_kmh = avg_speed_kmh          # 平均行驶速度
+        self.charge_speed_kmh = charge_speed_kmh    # 每小时补充的续航里程
+        self.stop_overhead_hours = stop_overhead_hours  # 每次停站的固定耗时
+
+    def plan(
+        self,
+        start: Dict[str, float],
+        end: Dict[str, float],
+        current_battery: float,
+        max_range: float,
+        charge_to: float = 100.0,
+        reserve: float = 0.0,
+        optimize: str = "time"
+    ) -> Optional[Dict[str, Any]]:
+        """
+        规划从起点到终点的充电路线
+        charge_to 为每次充电的目标电量，reserve 为到达任一节点时需保留的电量（百分比）
+        无法到达时返回 None
+        """
+        if optimize not in self.OBJECTIVES:
+            raise ValueError(f"Unknown optimization objective: {optimize}")
+        if max_range <= 0:
+            raise ValueError("max_range must be positive")
+
+        index = self.index
+        n = len(index)
+        start_node, end_node = n, n + 1
+
+        start_reach = reachable_distance(current_battery, max_range, reserve)
+        leg_reach = reachable_distance(charge_to, max_range, reserve)
+        start_to_end = haversine(start["lat"], start["lon"], end["lat"], end["lon"])
+        to_end = haversine_one_to_many(
+            math.radians(end["lat"]), math.radians(end["lon"]), index.lats, index.lons
+        )
+        heuristic = self._heuristic(to_end, leg_reach, optimize)
+
+        g = np.full(n + 2, np.inf)
+        parent = np.full(n + 2, -1, dtype=np.int64)
+        g[start_node] = 0.0
+        heap = [(0.0, 0.0, start_node)]
+
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if cost > g[node]:
+                continue
+            if node == end_node:
+                break
+
+            if node == start_node:
+                lat, lon = start["lat"], start["lon"]
+                departure, reach, dist_to_end = current_battery, start_reach, start_to_end
+            else:
+                lat, lon = math.degrees(index.lats[node]), math.degrees(index.lons[node])
+                departure, reach, dist_to_end = charge_to, leg_reach, float(to_end[node])
+
+            if reach < 0:
+                continue
+
+            # 直接前往终点
+            if dist_to_end <= reach:
+                tentative = cost + self._end_cost(dist_to_end, optimize)
+                if tentative < g[end_node]:
+                    g[end_node] = tentative
+                    parent[end_node] = node
+                    heapq.heappush(heap, (tentative, tentative, end_node))
+
+            # 前往可达范围内的充电站，并剪掉不可能优于当前最优解的节点
+            neighbors, distances = index.within_radius(lat, lon, reach, sort=False)
+            tentative = cost + self._edge_cost(distances, departure, max_range, charge_to, optimize)
+            estimate = tentative + heuristic[neighbors]
+            better = (tentative < g[neighbors]) & (estimate < g[end_node]) & (neighbors != node)
+            neighbors = neighbors[better]
+            tentative = tentative[better]
+            g[neighbors] = tentative
+            parent[neighbors] = node
+            for f, t, v in zip(estimate[better].tolist(), tentative.tolist(), neighbors.tolist()):
+                heapq.heappush(heap, (f, t, v))
+
+        if not np.isfinite(g[end_node]):
+            return None
+
+        path = []
+        node = int(parent[end_node])
+        while node != start_node:
+            path.append(node)
+            node = int(parent[node])
+        path.reverse()
+
+        charging_stops = [self.index.chargers[i] for i in path]
+        return self.build_route(start, end, charging_stops, current_battery, max_range, charge_to, reserve, optimize)
+
+    def _heuristic(self, to_end: np.ndarray, leg_reach: float, optimize: str) -> np.ndarray:
+        """从充电站出发到终点的代价下界"""
+        if optimize == "distance":
+            return to_end
+        # 超出单次续航的部分至少需要对应的充电时间和停站次数
+        deficit = np.maximum(to_end - leg_reach, 0.0)
+        stops = np.ceil(deficit / leg_reach) if leg_reach > 0 else np.zeros_like(deficit)
+        return (
+            to_end / self.avg_speed_kmh
+            + deficit / self.charge_speed_kmh
+            + stops * self.stop_overhead_hours
+        )
+
+    def _edge_cost(
+        self,
+        distances: np.ndarray,
+        departure: float,
+        max_range: float,
+        charge_to: float,
+        optimize: str
+    ) -> np.ndarray:
+        """前往充电站并在该站充电的代价"""
+        if optimize == "distance":
+            return distances
+        arrival = arrival_battery(departure, distances, max_range)
+        charged_km = np.maximum(charge_to - arrival, 0.0) / 100 * max_range
+        return (
+            distances / self.avg_speed_kmh
+            + self.stop_overhead_hours
+            + charged_km / self.charge_speed_kmh
+        )
+
+    def _end_cost(self, distance: float, optimize: str) -> float:
+        """前往终点的代价"""
+        if optimize == "distance":
+            return distance
+        return distance / self.avg_speed_kmh
+
+    def build_route(
+        self,
+        start: Dict[str, float],
+        end: Dict[str, float],
+        charging_stops: Sequence[Dict[str, Any]],
+        current_battery: float,
+        max_range: float,
+        charge_to: float = 100.0,
+        reserve: float = 0.0,
+        optimize: str = "time"
+    ) -> Optional[Dict[str, Any]]:
+        """
+        按给定的充电站序列生成路线结果，各段距离、电量和耗时均按本次输入计算
+        任一段到达时电量低于 reserve 则返回 None，可用于校验缓存的方案是否仍然可行
+        """
+        points = [start] + [stop["location"] for stop in charging_stops] + [end]
+
+        legs = []
+        total_distance = 0.0
+        total_climb = total_descent = None
+        charging_time = 0.0
+        departure = current_battery
+        for i in range(len(points) - 1):
+            distance = haversine(points[i]["lat"], points[i]["lon"], points[i + 1]["lat"], points[i + 1]["lon"])
+            arrival = arrival_battery(departure, distance, max_range)
+            if arrival < reserve - FEASIBILITY_TOLERANCE:
+                return None
+            leg = {
+                "distance": distance,
+                "departure_battery": departure,
+                "arrival_battery": arrival
+            }
+            if self.elevation is not None:
+                profile = self.elevation.profile(
+                    [points[i]["lat"], points[i + 1]["lat"]],
+                    [points[i]["lon"], points[i + 1]["lon"]]
+                )
+                if profile is not None:
+                    leg["climb"] = profile["climb"]
+                    leg["descent"] = profile["descent"]
+                    total_climb = (total_climb or 0.0) + profile["climb"]
+                    total_descent = (total_descent or 0.0) + profile["descent"]
+            legs.append(leg)
+            total_distance += distance
+            if i < len(charging_stops):
+                charged_km = max(charge_to - arrival, 0.0) / 100 * max_range
+                charging_time += self.stop_overhead_hours + charged_km / self.charge_speed_kmh
+                departure = charge_to
+
+        driving_time = total_distance / self.avg_speed_kmh
+        result = {
+            "route": points,
+            "charging_stops": list(charging_stops),
+            "legs": legs,
+            "total_distance": total_distance,
+            "estimated_consumption": (total_distance / max_range) * 100,
+            "driving_time_hours": driving_time,
+            "charging_time_hours": charging_time,
+            "total_time_hours": driving_time + charging_time,
+            "optimize": optimize
+        }
+        if total_climb is not None:
+            result["climb"] = total_climb
+            result["descent"] = total_descent
+        return result
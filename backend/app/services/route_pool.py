@@ -0,0 +1,119 @@
+import os
+import math
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+from dotenv import load_dotenv
+from app.services.charger_catalog import ChargerCatalog
+from app.services.charger_index import ChargerIndex
+from app.services.charger_store import load_charger_store
+from app.services.elevation import get_elevation_model
+from app.services.route_planner import ChargingRoutePlanner
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 工作进程内的规划器，由进程池初始化函数按充电站目录构建一次
+_worker_planner: Optional[ChargingRoutePlanner] = None
+
+
+def _init_worker(chargers: List[Dict[str, Any]]) -> None:
+    global _worker_planner
+    _worker_planner = ChargingRoutePlanner(ChargerIndex.from_chargers(chargers), elevation=get_elevation_model())
+
+
+def _init_worker_from_store(path: str) -> None:
+    global _worker_planner
+    _worker_planner = ChargingRoutePlanner(load_charger_store(path), elevation=get_elevation_model())
+
+
+def _plan_with(planner: ChargingRoutePlanner, requests: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    results = []
+    for request in requests:
+        try:
+            results.append(planner.plan(
+                request["start_location"],
+                request["end_location"],
+                request["current_battery_level"],
+                request["max_range"],
+                charge_to=request.get("charge_to", 100.0),
+                reserve=request.get("reserve", 0.0),
+                optimize=request.get("optimize", "time")
+            ))
+        except Exception as e:
+            logger.error(f"Error planning route: {str(e)}")
+            results.append(None)
+    return results
+
+
+def _plan_in_worker(requests: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    return _plan_with(_worker_planner, requests)
+
+
+class RoutePlanningPool:
+    """
+    路线规划进程池
+
+    路线规划是纯 CPU 计算，放到独立进程中执行以免阻塞事件循环。每个工作进程在
+    启动时载入一次充电站目录，目录版本变化时重建进程池。
+    ROUTE_POOL_WORKERS 为 0 时改为在线程池中使用当前进程的目录计算。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        if max_workers is None:
+            max_workers = int(os.getenv("ROUTE_POOL_WORKERS", str(os.cpu_count() or 1)))
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._version: Optional[int] = None
+
+    def _executor_for(self, catalog: ChargerCatalog) -> Executor:
+        if self._executor is None or self._version != catalog.version:
+            previous = self._executor
+            if catalog.source_path is not None:
+                # 离线目录直接映射同一文件，无需向每个工作进程传输充电站列表
+                initializer, initargs = _init_worker_from_store, (catalog.source_path,)
+            else:
+                initializer, initargs = _init_worker, (catalog.chargers,)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=initializer,
+                initargs=initargs
+            )
+            self._version = catalog.version
+            if previous is not None:
+                # 旧进程池处理完已提交的任务后自行退出
+                previous.shutdown(wait=False)
+        return self._executor
+
+    async def plan_batch(
+        self,
+        catalog: ChargerCatalog,
+        requests: List[Dict[str, Any]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """批量规划路线，结果与输入顺序一致，无法规划的请求对应 None"""
+        if not requests:
+            return []
+
+        loop = asyncio.get_running_loop()
+        if self.max_workers <= 0:
+            planner = ChargingRoutePlanner(catalog.index, elevation=get_elevation_model())
+            return await loop.run_in_executor(None, _plan_with, planner, requests)
+
+        # 按工作进程数分块提交，减少进程间通信次数
+        executor = self._executor_for(catalog)
+        chunk_size = max(1, math.ceil(len(requests) / (self.max_workers * 4)))
+        chunks = [requests[i:i + chunk_size] for i in range(0, len(requests), chunk_size)]
+        planned = await asyncio.gather(*[
+            loop.run_in_executor(executor, _plan_in_worker, chunk)
+            for chunk in chunks
+        ])
+        return [route for chunk in planned for route in chunk]
+
+    def shutdown(self) -> None:
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._version = None
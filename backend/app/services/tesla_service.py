@@ -1,9 +1,18 @@
 import os
-import aiohttp
+import math
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable, Awaitable, Tuple
 from dotenv import load_dotenv
 from datetime import datetime
+from app.core.http_client import http_client
+from app.core.cache import CacheEntry, SingleFlight, TTLCache
+from app.services.charger_catalog import ChargerCatalog
+from app.services.charger_index import ChargerIndex
+from app.services.geo import haversine
+from app.services.elevation import get_elevation_model
+from app.services.route_planner import ChargingRoutePlanner, arrival_battery, reachable_distance
+from app.services.route_pool import RoutePlanningPool
 
 load_dotenv()
 
@@ -18,136 +27,292 @@ class TeslaService:
             logger.error("TESLA_CLIENT_ID or TESLA_CLIENT_SECRET not found in environment variables")
             raise ValueError("Tesla API credentials are required")
             
-        self.base_url = "https://owner-api.teslamotors.com/api/1"
-        self.auth_url = "https://auth.tesla.com/oauth2/v3"
-        self.token = None
+        # 上游地址可通过环境变量指向本地模拟服务，便于离线压测
+        self.base_url = os.getenv("TESLA_API_BASE_URL", "https://owner-api.teslamotors.com/api/1")
+        self.auth_url = os.getenv("TESLA_AUTH_URL", "https://auth.tesla.com/oauth2/v3")
+        # 拉取充电站目录使用的服务端令牌，与用户令牌分开
+        self.service_token = os.getenv("TESLA_SERVICE_TOKEN")
+        # 批量获取车辆数据时的默认并发数及上限
+        self.fleet_concurrency = int(os.getenv("TESLA_FLEET_CONCURRENCY", "10"))
+        self.fleet_max_concurrency = int(os.getenv("TESLA_FLEET_MAX_CONCURRENCY", "50"))
+        # 车辆数据快照缓存，同一车辆的并发请求合并为一次上游调用
+        self._vehicle_cache = TTLCache(
+            ttl=float(os.getenv("VEHICLE_SNAPSHOT_TTL", "5")),
+            maxsize=int(os.getenv("VEHICLE_SNAPSHOT_MAX_ENTRIES", "10000"))
+        )
+        self._vehicle_flight = SingleFlight()
+        # 路线规划结果缓存，起终点坐标和电量经过量化后作为键
+        self._route_cache = TTLCache(
+            ttl=float(os.getenv("ROUTE_CACHE_TTL", "600")),
+            maxsize=int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "2048"))
+        )
+        self.route_coord_decimals = int(os.getenv("ROUTE_CACHE_COORD_DECIMALS", "3"))
+        self.route_battery_bucket = float(os.getenv("ROUTE_CACHE_BATTERY_BUCKET", "2"))
+        self.route_pool = RoutePlanningPool()
+        self.route_batch_max_size = int(os.getenv("ROUTE_BATCH_MAX_SIZE", "500"))
+        self._charger_index = None
+        self._charger_index_source = None
 
     async def get_access_token(self, email: str, password: str) -> Optional[str]:
-        """获取访问令牌"""
+        """获取访问令牌，令牌由调用方保存并在后续请求中传入"""
         try:
-            async with aiohttp.ClientSession() as session:
-                # 第一步：获取授权码
-                auth_data = {
-                    "grant_type": "password",
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                    "email": email,
-                    "password": password
-                }
+            session = http_client.session
+            # 第一步：获取授权码
+            auth_data = {
+                "grant_type": "password",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "email": email,
+                "password": password
+            }
                 
-                async with session.post(
-                    f"{self.auth_url}/token",
-                    json=auth_data
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        self.token = data.get("access_token")
-                        return self.token
-                    logger.error(f"Failed to get access token: {response.status}")
-                    return None
+            async with session.post(
+                f"{self.auth_url}/token",
+                json=auth_data
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return data.get("access_token")
+                logger.error(f"Failed to get access token: {response.status}")
+                return None
         except Exception as e:
             logger.error(f"Error getting access token: {str(e)}")
             return None
 
-    async def get_vehicles(self) -> List[Dict[str, Any]]:
+    async def get_vehicles(self, token: str) -> List[Dict[str, Any]]:
         """获取用户的所有车辆"""
-        if not self.token:
+        if not token:
             logger.error("No access token available")
             return []
             
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/vehicles",
-                    headers={"Authorization": f"Bearer {self.token}"}
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("response", [])
-                    logger.error(f"Failed to get vehicles: {response.status}")
-                    return []
+            session = http_client.session
+            async with session.get(
+                f"{self.base_url}/vehicles",
+                headers={"Authorization": f"Bearer {token}"}
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return data.get("response", [])
+                logger.error(f"Failed to get vehicles: {response.status}")
+                return []
         except Exception as e:
             logger.error(f"Error getting vehicles: {str(e)}")
             return []
 
-    async def get_supercharger_locations(self) -> List[Dict[str, Any]]:
+    async def get_supercharger_locations(self, token: str) -> List[Dict[str, Any]]:
         """获取所有Tesla超级充电站位置"""
-        if not self.token:
+        if not token:
             logger.error("No access token available")
             return []
             
         try:
             url = f"{self.base_url}/superchargers"
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    url,
-                    headers={"Authorization": f"Bearer {self.token}"}
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("response", [])
-                    logger.error(f"Failed to get superchargers: {response.status}")
-                    return []
+            session = http_client.session
+            async with session.get(
+                url,
+                headers={"Authorization": f"Bearer {token}"}
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return data.get("response", [])
+                logger.error(f"Failed to get superchargers: {response.status}")
+                return []
         except Exception as e:
             logger.error(f"Error getting superchargers: {str(e)}")
             return []
 
-    async def get_vehicle_data(self, vehicle_id: str) -> Optional[Dict[str, Any]]:
-        """获取特定车辆的数据"""
-        if not self.token:
+    async def get_service_superchargers(self) -> List[Dict[str, Any]]:
+        """使用服务端令牌获取充电站位置，供充电站目录刷新使用"""
+        if not self.service_token:
+            logger.warning("TESLA_SERVICE_TOKEN not configured, cannot refresh supercharger catalog")
+            return []
+        return await self.get_supercharger_locations(self.service_token)
+
+    async def _fetch_vehicle_data(self, token: str, vehicle_id: str) -> Optional[Dict[str, Any]]:
+        """从上游获取特定车辆的数据"""
+        if not token:
             logger.error("No access token available")
             return None
             
         try:
             url = f"{self.base_url}/vehicles/{vehicle_id}/vehicle_data"
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    url,
-                    headers={"Authorization": f"Bearer {self.token}"}
-                ) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    logger.error(f"Failed to get vehicle data: {response.status}")
-                    return None
+            session = http_client.session
+            async with session.get(
+                url,
+                headers={"Authorization": f"Bearer {token}"}
+            ) as response:
+                if response.status == 200:
+                    return await response.json()
+                logger.error(f"Failed to get vehicle data: {response.status}")
+                return None
         except Exception as e:
             logger.error(f"Error getting vehicle data: {str(e)}")
             return None
 
-    async def get_vehicle_state(self, vehicle_id: str) -> Optional[Dict[str, Any]]:
-        """获取车辆状态"""
-        if not self.token:
+    async def _fetch_vehicle_state(self, token: str, vehicle_id: str) -> Optional[Dict[str, Any]]:
+        """从上游获取车辆状态"""
+        if not token:
             logger.error("No access token available")
             return None
             
         try:
             url = f"{self.base_url}/vehicles/{vehicle_id}/vehicle_state"
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    url,
-                    headers={"Authorization": f"Bearer {self.token}"}
-                ) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    logger.error(f"Failed to get vehicle state: {response.status}")
-                    return None
+            session = http_client.session
+            async with session.get(
+                url,
+                headers={"Authorization": f"Bearer {token}"}
+            ) as response:
+                if response.status == 200:
+                    return await response.json()
+                logger.error(f"Failed to get vehicle state: {response.status}")
+                return None
         except Exception as e:
             logger.error(f"Error getting vehicle state: {str(e)}")
             return None
 
-    async def wake_up_vehicle(self, vehicle_id: str) -> bool:
+    async def _snapshot(
+        self,
+        kind: str,
+        fetch: Callable[[str, str], Awaitable[Optional[Dict[str, Any]]]],
+        token: str,
+        vehicle_id: str,
+        max_age: Optional[float]
+    ) -> Tuple[Optional[CacheEntry], bool]:
+        # 缓存键包含令牌，不同账号之间不会共享车辆数据
+        key = (kind, token, vehicle_id)
+        entry = self._vehicle_cache.get(key, max_age)
+        if entry is not None:
+            return entry, True
+
+        async def load() -> Optional[CacheEntry]:
+            data = await fetch(token, vehicle_id)
+            if data is None:
+                return None
+            return self._vehicle_cache.set(key, data)
+
+        return await self._vehicle_flight.do(key, load), False
+
+    async def get_vehicle_snapshot(
+        self,
+        token: str,
+        vehicle_id: str,
+        max_age: Optional[float] = None
+    ) -> Tuple[Optional[CacheEntry], bool]:
+        """
+        获取车辆数据快照，返回（缓存条目, 是否命中缓存）
+        max_age 为可接受的最大数据年龄（秒），0 表示强制从上游获取
+        """
+        return await self._snapshot("vehicle_data", self._fetch_vehicle_data, token, vehicle_id, max_age)
+
+    async def get_vehicle_state_snapshot(
+        self,
+        token: str,
+        vehicle_id: str,
+        max_age: Optional[float] = None
+    ) -> Tuple[Optional[CacheEntry], bool]:
+        """获取车辆状态快照，返回（缓存条目, 是否命中缓存）"""
+        return await self._snapshot("vehicle_state", self._fetch_vehicle_state, token, vehicle_id, max_age)
+
+    async def get_vehicle_data(
+        self,
+        token: str,
+        vehicle_id: str,
+        max_age: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """获取特定车辆的数据"""
+        snapshot, _ = await self.get_vehicle_snapshot(token, vehicle_id, max_age)
+        return snapshot.value if snapshot else None
+
+    async def get_vehicle_state(
+        self,
+        token: str,
+        vehicle_id: str,
+        max_age: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """获取车辆状态"""
+        snapshot, _ = await self.get_vehicle_state_snapshot(token, vehicle_id, max_age)
+        return snapshot.value if snapshot else None
+
+    def vehicle_cache_stats(self) -> Dict[str, Any]:
+        """车辆快照缓存统计"""
+        return {
+            "cache": self._vehicle_cache.stats(),
+            "single_flight": self._vehicle_flight.stats()
+        }
+
+    async def get_fleet_vehicle_ids(self, token: str) -> List[str]:
+        """获取账号下所有车辆的ID"""
+        vehicles = await self.get_vehicles(token)
+        return [str(vehicle["id"]) for vehicle in vehicles if vehicle.get("id") is not None]
+
+    def _fleet_semaphore(self, concurrency: Optional[int]) -> asyncio.Semaphore:
+        if not concurrency or concurrency < 1:
+            concurrency = self.fleet_concurrency
+        return asyncio.Semaphore(min(concurrency, self.fleet_max_concurrency))
+
+    async def _fetch_fleet_item(
+        self,
+        token: str,
+        vehicle_id: str,
+        semaphore: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        async with semaphore:
+            snapshot, _ = await self.get_vehicle_snapshot(token, vehicle_id)
+        if snapshot is None:
+            return {"vehicle_id": vehicle_id, "error": "Failed to get vehicle data"}
+        return {"vehicle_id": vehicle_id, "data": snapshot.value, "age": snapshot.age}
+
+    async def get_vehicles_data_batch(
+        self,
+        token: str,
+        vehicle_ids: List[str],
+        concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        并发获取多辆车的数据，结果与 vehicle_ids 顺序一致
+        每项包含 data 或 error，单辆车失败不影响其他车辆
+        """
+        semaphore = self._fleet_semaphore(concurrency)
+        return await asyncio.gather(*[
+            self._fetch_fleet_item(token, vehicle_id, semaphore)
+            for vehicle_id in vehicle_ids
+        ])
+
+    async def iter_vehicles_data(
+        self,
+        token: str,
+        vehicle_ids: List[str],
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """并发获取多辆车的数据，按完成先后逐个产出结果"""
+        semaphore = self._fleet_semaphore(concurrency)
+        tasks = [
+            asyncio.create_task(self._fetch_fleet_item(token, vehicle_id, semaphore))
+            for vehicle_id in vehicle_ids
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 客户端提前断开时取消剩余请求
+            for task in tasks:
+                task.cancel()
+
+    async def wake_up_vehicle(self, token: str, vehicle_id: str) -> bool:
         """唤醒车辆"""
-        if not self.token:
+        if not token:
             logger.error("No access token available")
             return False
             
         try:
             url = f"{self.base_url}/vehicles/{vehicle_id}/wake_up"
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url,
-                    headers={"Authorization": f"Bearer {self.token}"}
-                ) as response:
-                    return response.status == 200
+            session = http_client.session
+            async with session.post(
+                url,
+                headers={"Authorization": f"Bearer {token}"}
+            ) as response:
+                return response.status == 200
         except Exception as e:
             logger.error(f"Error waking up vehicle: {str(e)}")
             return False
@@ -158,41 +323,33 @@ class TeslaService:
         end_location: Dict[str, float],
         current_battery_level: float,
         max_range: float,
-        superchargers: List[Dict[str, Any]] = None
+        superchargers: List[Dict[str, Any]] = None,
+        charge_to: float = 100.0,
+        reserve: float = 0.0,
+        optimize: str = "time",
+        charger_index: Optional[ChargerIndex] = None
     ) -> Optional[Dict[str, Any]]:
         """
-        计算包含充电站的路线
+        计算包含充电站的路线（同步，在当前线程中计算，不经过缓存）
+        optimize 为 "time" 时最小化行驶加充电总时间，为 "distance" 时最小化总里程
+        已有充电站目录时可直接传入其空间索引 charger_index；异步、带缓存的版本见 plan_route
         """
         try:
-            if not superchargers:
-                logger.error("No supercharger data available")
-                return None
-
-            # 计算直接距离
-            direct_distance = self._calculate_distance(
-                start_location["lat"],
-                start_location["lon"],
-                end_location["lat"],
-                end_location["lon"]
-            )
+            if charger_index is None:
+                if not superchargers:
+                    logger.error("No supercharger data available")
+                    return None
+                charger_index = self._get_charger_index(superchargers)
 
-            # 检查是否需要充电
-            estimated_consumption = (direct_distance / max_range) * 100
-            if current_battery_level >= estimated_consumption:
-                return {
-                    "route": [start_location, end_location],
-                    "charging_stops": [],
-                    "total_distance": direct_distance,
-                    "estimated_consumption": estimated_consumption
-                }
-
-            # 寻找最佳充电站
-            best_route = self._find_best_route(
+            planner = ChargingRoutePlanner(charger_index, elevation=get_elevation_model())
+            best_route = planner.plan(
                 start_location,
                 end_location,
                 current_battery_level,
                 max_range,
-                superchargers
+                charge_to=charge_to,
+                reserve=reserve,
+                optimize=optimize
             )
 
             if not best_route:
@@ -205,102 +362,172 @@ class TeslaService:
             logger.error(f"Error calculating route: {str(e)}")
             return None
 
-    def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """计算两点之间的距离（公里）"""
-        from math import radians, sin, cos, sqrt, atan2
-        
-        R = 6371  # 地球半径（公里）
+    def _get_charger_index(self, superchargers: List[Dict[str, Any]]) -> ChargerIndex:
+        """获取充电站空间索引，同一份充电站列表只构建一次"""
+        if self._charger_index is None or self._charger_index_source is not superchargers:
+            self._charger_index = ChargerIndex.from_chargers(superchargers)
+            self._charger_index_source = superchargers
+        return self._charger_index
 
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
+    def _route_cache_key(self, catalog: ChargerCatalog, request: Dict[str, Any]):
+        """
+        生成路线缓存键
+        起终点坐标按 route_coord_decimals 取整，电量按 route_battery_bucket 向下取整到桶边界，
+        键相同的请求可以共享同一组充电站；目录更新后旧结果自动失效
+        """
+        decimals = self.route_coord_decimals
+        start, end = request["start_location"], request["end_location"]
+        return (
+            catalog.version,
+            round(start["lat"], decimals), round(start["lon"], decimals),
+            round(end["lat"], decimals), round(end["lon"], decimals),
+            math.floor(request["current_battery_level"] / self.route_battery_bucket),
+            request["max_range"],
+            request.get("charge_to", 100.0),
+            request.get("reserve", 0.0),
+            request.get("optimize", "time")
+        )
 
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        distance = R * c
+    def _reuse_route(
+        self,
+        planner: ChargingRoutePlanner,
+        cached: Dict[str, Any],
+        request: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        按请求的实际起终点和电量重新计算缓存方案的各段路程
+        方案对本次输入不可行，或本次可以直达而方案仍需充电时返回 None
+        """
+        start, end = request["start_location"], request["end_location"]
+        battery, max_range = request["current_battery_level"], request["max_range"]
+        reserve = request.get("reserve", 0.0)
+        if cached["charging_stops"] and (
+            haversine(start["lat"], start["lon"], end["lat"], end["lon"])
+            <= reachable_distance(battery, max_range, reserve)
+        ):
+            return None
+        return planner.build_route(
+            start,
+            end,
+            cached["charging_stops"],
+            battery,
+            max_range,
+            charge_to=request.get("charge_to", 100.0),
+            reserve=reserve,
+            optimize=request.get("optimize", "time")
+        )
 
-        return distance
+    async def plan_routes(
+        self,
+        catalog: ChargerCatalog,
+        requests: List[Dict[str, Any]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        带缓存的批量路线规划，结果与输入顺序一致
+        每个请求包含 start_location、end_location、current_battery_level、max_range，
+        以及可选的 charge_to、reserve、optimize。未命中缓存的请求按原始输入交给进程池计算，
+        结果与 calculate_route_with_charging 相同；命中时复用缓存方案的充电站序列，
+        并按本次输入重新校验和计算各段路程
+        """
+        planner = ChargingRoutePlanner(catalog.index, elevation=get_elevation_model())
+        keys = [self._route_cache_key(catalog, request) for request in requests]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+        misses: List[int] = []
+        for i, (key, request) in enumerate(zip(keys, requests)):
+            entry = self._route_cache.get(key)
+            route = self._reuse_route(planner, entry.value, request) if entry is not None else None
+            if route is not None:
+                results[i] = route
+            else:
+                misses.append(i)
+
+        # 同一批中键相同的请求先只规划一个，其余尝试复用其结果
+        first: Dict[Any, int] = {}
+        for i in misses:
+            first.setdefault(keys[i], i)
+        planned = await self.route_pool.plan_batch(catalog, [requests[i] for i in first.values()])
+        for i, route in zip(first.values(), planned):
+            results[i] = route
+            if route is not None:
+                self._route_cache.set(keys[i], route)
+
+        retry = []
+        for i in misses:
+            if first[keys[i]] == i:
+                continue
+            leader = results[first[keys[i]]]
+            route = self._reuse_route(planner, leader, requests[i]) if leader is not None else None
+            if route is not None:
+                results[i] = route
+            else:
+                retry.append(i)
 
-    def _find_best_route(
+        exact = await self.route_pool.plan_batch(catalog, [requests[i] for i in retry])
+        for i, route in zip(retry, exact):
+            results[i] = route
+        return results
+
+    async def plan_route(
         self,
-        start: Dict[str, float],
-        end: Dict[str, float],
-        current_battery: float,
+        catalog: ChargerCatalog,
+        start_location: Dict[str, float],
+        end_location: Dict[str, float],
+        current_battery_level: float,
         max_range: float,
-        superchargers: List[Dict[str, Any]]
+        charge_to: float = 100.0,
+        reserve: float = 0.0,
+        optimize: str = "time"
     ) -> Optional[Dict[str, Any]]:
-        """寻找最佳路线"""
-        try:
-            # 按距离排序充电站
-            sorted_chargers = sorted(
-                superchargers,
-                key=lambda x: self._calculate_distance(
-                    start["lat"],
-                    start["lon"],
-                    x["location"]["lat"],
-                    x["location"]["lon"]
-                )
-            )
+        """带缓存的单条路线规划，计算在进程池中进行，不阻塞事件循环"""
+        results = await self.plan_routes(catalog, [{
+            "start_location": start_location,
+            "end_location": end_location,
+            "current_battery_level": current_battery_level,
+            "max_range": max_range,
+            "charge_to": charge_to,
+            "reserve": reserve,
+            "optimize": optimize
+        }])
+        return results[0]
 
-            route = [start]
-            charging_stops = []
-            total_distance = 0
-            remaining_battery = current_battery
-
-            current_pos = start
-            while True:
-                # 检查是否能直接到达终点
-                direct_distance = self._calculate_distance(
-                    current_pos["lat"],
-                    current_pos["lon"],
-                    end["lat"],
-                    end["lon"]
-                )
-                estimated_consumption = (direct_distance / max_range) * 100
-
-                if remaining_battery >= estimated_consumption:
-                    route.append(end)
-                    total_distance += direct_distance
-                    break
-
-                # 寻找最近的充电站
-                next_charger = None
-                for charger in sorted_chargers:
-                    charger_distance = self._calculate_distance(
-                        current_pos["lat"],
-                        current_pos["lon"],
-                        charger["location"]["lat"],
-                        charger["location"]["lon"]
-                    )
-                    charger_consumption = (charger_distance / max_range) * 100
-
-                    if remaining_battery >= charger_consumption:
-                        next_charger = charger
-                        break
-
-                if not next_charger:
-                    logger.error("No reachable charging station found")
-                    return None
+    def find_reachable_chargers(
+        self,
+        catalog: ChargerCatalog,
+        location: Dict[str, float],
+        current_battery_level: float,
+        max_range: float,
+        reserve: float = 0.0,
+        offset: int = 0,
+        limit: int = 50
+    ) -> Dict[str, Any]:
+        """
+        查询当前电量可达的充电站，按距离升序分页返回
+        能耗模型与路线规划一致，arrival_battery 为到达该站时的剩余电量
+        """
+        reach = reachable_distance(current_battery_level, max_range, reserve)
+        indices, distances = catalog.index.within_radius(location["lat"], location["lon"], reach)
+        page_indices = indices[offset:offset + limit]
+        page_distances = distances[offset:offset + limit]
+        arrivals = arrival_battery(current_battery_level, page_distances, max_range)
 
-                # 添加到路线
-                route.append(next_charger["location"])
-                charging_stops.append(next_charger)
-                total_distance += self._calculate_distance(
-                    current_pos["lat"],
-                    current_pos["lon"],
-                    next_charger["location"]["lat"],
-                    next_charger["location"]["lon"]
-                )
-                remaining_battery = 100  # 假设在充电站充满电
-                current_pos = next_charger["location"]
-
-            return {
-                "route": route,
-                "charging_stops": charging_stops,
-                "total_distance": total_distance,
-                "estimated_consumption": (total_distance / max_range) * 100
-            }
+        chargers = []
+        for i, distance, arrival in zip(page_indices.tolist(), page_distances.tolist(), arrivals.tolist()):
+            charger = dict(catalog.index.chargers[i])
+            charger["distance"] = distance
+            charger["arrival_battery"] = arrival
+            chargers.append(charger)
 
-        except Exception as e:
-            logger.error(f"Error finding best route: {str(e)}")
-            return None 
\ No newline at end of file
+        return {
+            "total": len(indices),
+            "offset": offset,
+            "limit": limit,
+            "reach": max(reach, 0.0),
+            "chargers": chargers
+        }
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """车辆快照与路线缓存统计"""
+        return {
+            "vehicle_snapshots": self.vehicle_cache_stats(),
+            "routes": self._route_cache.stats()
+        }
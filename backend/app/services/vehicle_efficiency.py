@@ -0,0 +1,159 @@
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+TELEMETRY_FIELDS = ("distance", "energy_used", "expected", "terrain_energy")
+
+
+class TelemetryRing:
+    """
+    定长遥测环形缓冲区
+
+    样本按列存入预分配的 float32 数组，写满后覆盖最旧的样本，内存占用固定
+    """
+
+    __slots__ = ("data", "head", "size")
+
+    def __init__(self, capacity: int):
+        self.data = np.zeros((capacity, len(TELEMETRY_FIELDS)), dtype=np.float32)
+        self.head = 0
+        self.size = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.data.shape[0]
+
+    def extend(self, rows: np.ndarray) -> None:
+        """追加一批样本，rows 形状为 (n, len(TELEMETRY_FIELDS))"""
+        capacity = self.capacity
+        if len(rows) > capacity:
+            rows = rows[-capacity:]
+        n = len(rows)
+        index = (self.head + np.arange(n)) % capacity
+        self.data[index] = rows
+        self.head = (self.head + n) % capacity
+        self.size = min(self.size + n, capacity)
+
+    def column(self, field: str) -> np.ndarray:
+        """按写入顺序返回某一列的样本"""
+        values = self.data[:, TELEMETRY_FIELDS.index(field)]
+        if self.size < self.capacity:
+            return values[:self.size]
+        return np.roll(values, -self.head)
+
+
+class VehicleEfficiency:
+    """
+    单车效率系数的在线估计
+
+    以模型预测行驶能耗 x 和扣除地形能耗后的实际能耗 y 做过原点的指数遗忘最小二乘 y ≈ c·x，
+    只维护加权和 Σw·x·y、Σw·x²，每批样本增量更新，无需重新拟合历史数据
+    """
+
+    __slots__ = ("sxy", "sxx", "samples", "ring")
+
+    def __init__(self, capacity: int):
+        self.sxy = 0.0
+        self.sxx = 0.0
+        self.samples = 0
+        self.ring = TelemetryRing(capacity)
+
+    @property
+    def coefficient(self) -> Optional[float]:
+        return self.sxy / self.sxx if self.sxx > 0 else None
+
+    def update(self, expected: np.ndarray, driving_energy: np.ndarray, decay: float) -> None:
+        n = len(expected)
+        # 批内越早的样本衰减越多，与逐条更新结果一致
+        weights = decay ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        carry = decay ** n
+        self.sxy = carry * self.sxy + float(np.dot(weights, expected * driving_energy))
+        self.sxx = carry * self.sxx + float(np.dot(weights, expected * expected))
+        self.samples += n
+
+
+class VehicleEfficiencyStore:
+    """
+    按车辆保存学习到的效率系数
+
+    以 (owner, vehicle_id) 为键，owner 为上传遥测的用户，不同用户的同一车辆ID互不影响；
+    两者均按字符串比较。超过 max_vehicles 时淘汰最久未更新的车辆，每辆车的遥测缓冲区大小固定，
+    总内存与上传的样本数量无关
+    """
+
+    def __init__(self, max_vehicles: int = 1000, buffer_size: int = 1024, half_life: float = 500, min_samples: int = 20):
+        self.max_vehicles = max_vehicles
+        self.buffer_size = buffer_size
+        self.half_life = half_life
+        # 每条样本的遗忘因子，half_life 条样本后旧数据权重减半
+        self.decay = 0.5 ** (1 / half_life)
+        self.min_samples = min_samples
+        self._vehicles: "OrderedDict[Tuple[str, str], VehicleEfficiency]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._vehicles)
+
+    def _key(self, owner: Any, vehicle_id: Any) -> Tuple[str, str]:
+        return str(owner), str(vehicle_id)
+
+    def update(
+        self,
+        owner: str,
+        vehicle_id: str,
+        expected: np.ndarray,
+        energy_used: np.ndarray,
+        distance: np.ndarray,
+        terrain_energy: np.ndarray
+    ) -> VehicleEfficiency:
+        """
+        加入一批已校验的样本
+        expected 为效率系数取 1 时模型预测的行驶能耗（不含地形），terrain_energy 为地形能耗
+        """
+        key = self._key(owner, vehicle_id)
+        state = self._vehicles.get(key)
+        if state is None:
+            state = VehicleEfficiency(self.buffer_size)
+            self._vehicles[key] = state
+            while len(self._vehicles) > self.max_vehicles:
+                self._vehicles.popitem(last=False)
+        else:
+            self._vehicles.move_to_end(key)
+
+        state.update(expected, energy_used - terrain_energy, self.decay)
+        state.ring.extend(np.column_stack((distance, energy_used, expected, terrain_energy)))
+        return state
+
+    def get(self, owner: str, vehicle_id: str) -> Optional[VehicleEfficiency]:
+        return self._vehicles.get(self._key(owner, vehicle_id))
+
+    def coefficient(self, owner: Optional[str], vehicle_id: Optional[str]) -> Optional[float]:
+        """样本足够时返回学习到的效率系数，否则返回 None"""
+        if owner is None or vehicle_id is None:
+            return None
+        state = self.get(owner, vehicle_id)
+        if state is None or state.samples < self.min_samples:
+            return None
+        return state.coefficient
+
+    def describe(self, owner: str, vehicle_id: str) -> Optional[Dict[str, Any]]:
+        """车辆效率系数及最近样本的统计"""
+        state = self.get(owner, vehicle_id)
+        if state is None:
+            return None
+        ring = state.ring
+        distance = float(ring.column("distance").sum(dtype=np.float64))
+        energy_used = float(ring.column("energy_used").sum(dtype=np.float64))
+        expected = float(ring.column("expected").sum(dtype=np.float64))
+        terrain_energy = float(ring.column("terrain_energy").sum(dtype=np.float64))
+        return {
+            "efficiency_factor": state.coefficient,
+            "samples": state.samples,
+            "active": state.samples >= self.min_samples,
+            "recent": {
+                "samples": ring.size,
+                "distance": distance,
+                "energy_used": energy_used,
+                "consumption_per_100km": energy_used / distance * 100 if distance else None,
+                "efficiency_factor": (energy_used - terrain_energy) / expected if expected else None
+            }
+        }
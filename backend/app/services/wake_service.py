@@ -0,0 +1,155 @@
+import os
+import uuid
+import random
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+from dotenv import load_dotenv
+from app.core.cache import TTLCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class WakeJob:
+    """一次车辆唤醒任务"""
+
+    PENDING = "pending"
+    WAKING = "waking"
+    ONLINE = "online"
+    FAILED = "failed"
+    TIMEOUT = "timeout"
+
+    def __init__(self, vehicle_id: str, owner: str):
+        self.id = str(uuid.uuid4())
+        self.vehicle_id = vehicle_id
+        self.owner = owner
+        self.status = self.PENDING
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow().isoformat()
+        self.finished_at: Optional[str] = None
+        self.done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.done.is_set()
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        self.status = status
+        self.error = error
+        self.finished_at = datetime.utcnow().isoformat()
+        self.done.set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "vehicle_id": self.vehicle_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+
+class WakeJobManager:
+    """
+    服务端车辆唤醒编排
+
+    发送唤醒请求后以指数退避加随机抖动轮询车辆状态，直到车辆上线或超时；
+    同一账号对同一车辆的并发唤醒请求共享同一个任务。
+    """
+
+    def __init__(self, tesla_service):
+        self.tesla_service = tesla_service
+        self.timeout = float(os.getenv("WAKE_TIMEOUT", "60"))
+        self.initial_delay = float(os.getenv("WAKE_INITIAL_DELAY", "1"))
+        self.max_delay = float(os.getenv("WAKE_MAX_DELAY", "8"))
+        # 已完成的任务保留一段时间供查询
+        self._jobs = TTLCache(
+            ttl=float(os.getenv("WAKE_JOB_RETENTION", "600")),
+            maxsize=int(os.getenv("WAKE_JOB_MAX_ENTRIES", "10000"))
+        )
+        self._active: Dict[Tuple[str, str], WakeJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, token: str, vehicle_id: str) -> WakeJob:
+        """创建唤醒任务，已有进行中的任务时直接返回该任务"""
+        key = (token, vehicle_id)
+        job = self._active.get(key)
+        if job is not None:
+            return job
+
+        job = WakeJob(vehicle_id, token)
+        self._active[key] = job
+        self._jobs.set(job.id, job)
+        task = asyncio.create_task(self._run(job, token))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._release(key, job))
+        return job
+
+    def get(self, token: str, job_id: str) -> Optional[WakeJob]:
+        """查询任务，只能查询本账号创建的任务"""
+        entry = self._jobs.get(job_id)
+        if entry is None or entry.value.owner != token:
+            return None
+        return entry.value
+
+    async def wait(self, job: WakeJob, timeout: float) -> WakeJob:
+        """等待任务完成，最多等待 timeout 秒（长轮询）"""
+        if timeout > 0 and not job.finished:
+            try:
+                await asyncio.wait_for(asyncio.shield(job.done.wait()), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def shutdown(self) -> None:
+        """取消所有进行中的任务"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _release(self, key: Tuple[str, str], job: WakeJob) -> None:
+        if self._active.get(key) is job:
+            del self._active[key]
+        self._tasks.pop(job.id, None)
+        if not job.finished:
+            job.finish(WakeJob.FAILED, "Wake job cancelled")
+
+    async def _run(self, job: WakeJob, token: str) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        delay = self.initial_delay
+        wake_sent = False
+        job.status = WakeJob.WAKING
+
+        try:
+            while True:
+                job.attempts += 1
+                if not wake_sent:
+                    wake_sent = await self.tesla_service.wake_up_vehicle(token, job.vehicle_id)
+
+                # 车辆处于休眠时状态接口不可用，能取到状态即视为已上线
+                state = await self.tesla_service.get_vehicle_state(token, job.vehicle_id, max_age=0)
+                if state is not None:
+                    job.finish(WakeJob.ONLINE)
+                    return
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    job.finish(WakeJob.TIMEOUT, "Vehicle did not come online in time")
+                    return
+
+                # 抖动避免大量任务同时轮询
+                await asyncio.sleep(min(delay / 2 + random.uniform(0, delay / 2), remaining))
+                delay = min(delay * 2, self.max_delay)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error waking up vehicle {job.vehicle_id}: {str(e)}")
+            job.finish(WakeJob.FAILED, "Failed to wake up vehicle")
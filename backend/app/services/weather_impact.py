@@ -0,0 +1,25 @@
+import numpy as np
+from typing import Union
+
+ArrayLike = Union[float, np.ndarray]
+
+
+def weather_impact(temp: ArrayLike, humidity: ArrayLike, wind_speed: ArrayLike) -> ArrayLike:
+    """
+    计算天气对电动车续航的影响系数（0-1之间，1表示最大影响）
+    temp 单位为摄氏度，humidity 为百分比，wind_speed 单位为 m/s；
+    输入可以是标量或任意形状的数组，标量输入返回 float
+    """
+    temp = np.asarray(temp, dtype=np.float64)
+    humidity = np.asarray(humidity, dtype=np.float64)
+    wind_speed = np.asarray(wind_speed, dtype=np.float64)
+
+    # 温度影响
+    impact = np.select([temp < 0, temp < 10, temp > 30], [0.3, 0.2, 0.15], 0.0)
+    # 湿度影响
+    impact += np.where(humidity > 80, 0.1, 0.0)
+    # 风速影响
+    impact += np.select([wind_speed > 20, wind_speed > 10], [0.2, 0.1], 0.0)
+
+    np.minimum(impact, 1.0, out=impact)
+    return float(impact) if impact.ndim == 0 else impact
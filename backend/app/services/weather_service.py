@@ -1,17 +1,67 @@
 import os
-import aiohttp
-from typing import Dict, Any
+import math
+import asyncio
+import logging
+import numpy as np
+from typing import Dict, Any, List, Optional, Sequence
 from dotenv import load_dotenv
+from app.core.cache import TTLCache, SingleFlight
+from app.core.http_client import http_client
+from app.services.forecast import ForecastSeries, FORECAST_FIELDS
+from app.services.weather_impact import weather_impact
+from app.services.geo import geohash_encode, geohash_center, polyline_distances, interpolate_polyline
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class WeatherService:
     def __init__(self):
         self.api_key = os.getenv("OPENWEATHER_API_KEY")
-        self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.base_url = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
+        # 当前天气按 geohash 网格缓存，同一网格内的请求共享网格中心点的天气；
+        # 精度 5 约为 5 公里见方，OpenWeather 当前天气约每 10 分钟更新一次
+        self.tile_precision = int(os.getenv("WEATHER_GEOHASH_PRECISION", "5"))
+        self._weather_cache = TTLCache(
+            ttl=float(os.getenv("WEATHER_CACHE_TTL", "600")),
+            maxsize=int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "10000"))
+        )
+        # 同一网格的并发请求合并为一次上游调用，timeout 为单个请求的最长等待时间
+        self._flight = SingleFlight()
+        self.fetch_timeout = float(os.getenv("WEATHER_FETCH_TIMEOUT", "10"))
+        # 预报按网格缓存为时间序列，任意时刻的天气由缓存插值得到；OpenWeather 预报每 3 小时更新
+        self._forecast_cache = TTLCache(
+            ttl=float(os.getenv("WEATHER_FORECAST_TTL", "3600")),
+            maxsize=int(os.getenv("WEATHER_FORECAST_MAX_ENTRIES", "2000"))
+        )
+        self.forecast_max_points = int(os.getenv("WEATHER_FORECAST_MAX_POINTS", "1000"))
+        # 沿路线获取天气时的上游并发数及采样点数上限
+        self.route_concurrency = int(os.getenv("WEATHER_ROUTE_CONCURRENCY", "8"))
+        self.route_max_samples = int(os.getenv("WEATHER_ROUTE_MAX_SAMPLES", "200"))
+
+    def tile_of(self, lat: float, lon: float) -> str:
+        """位置所在的天气网格"""
+        return geohash_encode(lat, lon, self.tile_precision)
 
     async def get_weather(self, lat: float, lon: float) -> Dict[str, Any]:
-        """获取特定位置的天气数据"""
+        """
+        获取特定位置的天气数据
+        等待超过 fetch_timeout 秒时抛出 asyncio.TimeoutError
+        """
+        tile = self.tile_of(lat, lon)
+        entry = self._weather_cache.get(tile)
+        if entry is not None:
+            return entry.value
+
+        async def load() -> Dict[str, Any]:
+            weather_data = await self._fetch_weather(*geohash_center(tile))
+            if weather_data:
+                self._weather_cache.set(tile, weather_data)
+            return weather_data
+
+        return await self._flight.do(("weather", tile), load, self.fetch_timeout)
+
+    async def _fetch_weather(self, lat: float, lon: float) -> Dict[str, Any]:
         url = f"{self.base_url}/weather"
         params = {
             "lat": lat,
@@ -20,14 +70,35 @@ class WeatherService:
             "units": "metric"
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    return await response.json()
-                return {}
+        session = http_client.session
+        async with session.get(url, params=params) as response:
+            if response.status == 200:
+                return await response.json()
+            return {}
 
     async def get_weather_forecast(self, lat: float, lon: float) -> Dict[str, Any]:
-        """获取天气预报数据"""
+        """
+        获取天气预报数据
+        同一网格的并发请求共享网格中心点的预报，等待超时抛出 asyncio.TimeoutError
+        """
+        series = await self.get_forecast_series(self.tile_of(lat, lon))
+        return series.raw if series is not None else {}
+
+    async def get_forecast_series(self, tile: str) -> Optional[ForecastSeries]:
+        """获取网格的预报时间序列，优先使用缓存"""
+        entry = self._forecast_cache.get(tile)
+        if entry is not None:
+            return entry.value
+
+        async def load() -> Optional[ForecastSeries]:
+            series = ForecastSeries.from_forecast(await self._fetch_forecast(*geohash_center(tile)))
+            if series is not None:
+                self._forecast_cache.set(tile, series)
+            return series
+
+        return await self._flight.do(("forecast", tile), load, self.fetch_timeout)
+
+    async def _fetch_forecast(self, lat: float, lon: float) -> Dict[str, Any]:
         url = f"{self.base_url}/forecast"
         params = {
             "lat": lat,
@@ -36,11 +107,141 @@ class WeatherService:
             "units": "metric"
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    return await response.json()
-                return {}
+        session = http_client.session
+        async with session.get(url, params=params) as response:
+            if response.status == 200:
+                return await response.json()
+            return {}
+
+    async def get_weather_along_route(
+        self,
+        points: List[Dict[str, float]],
+        interval_km: float = 25.0
+    ) -> Dict[str, Any]:
+        """
+        获取沿路线分段的天气
+        points 为路线折线（如路线规划结果中的 route），按 interval_km 公里分段，
+        取每段中点的天气；位于同一网格的中点只请求一次，各网格并发获取
+        """
+        lats = [point["lat"] for point in points]
+        lons = [point["lon"] for point in points]
+        cumulative = polyline_distances(lats, lons)
+        total = float(cumulative[-1])
+
+        # 采样点过多时放大分段长度
+        count = max(1, math.ceil(total / interval_km))
+        if count > self.route_max_samples:
+            count = self.route_max_samples
+            interval_km = total / count
+        starts = np.arange(count) * interval_km
+        ends = np.minimum(starts + interval_km, total)
+        mid_lats, mid_lons = interpolate_polyline(lats, lons, cumulative, (starts + ends) / 2)
+
+        tiles = [self.tile_of(lat, lon) for lat, lon in zip(mid_lats.tolist(), mid_lons.tolist())]
+        unique = list(dict.fromkeys(tiles))
+        semaphore = asyncio.Semaphore(max(1, self.route_concurrency))
+
+        async def fetch(tile: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    return await self.get_weather(*geohash_center(tile)) or None
+                except Exception as e:
+                    logger.error(f"Error getting weather for tile {tile}: {str(e) or type(e).__name__}")
+                    return None
+
+        fetched = dict(zip(unique, await asyncio.gather(*[fetch(tile) for tile in unique])))
+
+        # 所有分段的影响系数一次向量化计算，缺失天气的分段按默认值计算后丢弃
+        weather = [fetched[tile] or {} for tile in tiles]
+        impacts = weather_impact(
+            np.array([data.get("main", {}).get("temp", 20) for data in weather], dtype=np.float64),
+            np.array([data.get("main", {}).get("humidity", 50) for data in weather], dtype=np.float64),
+            np.array([data.get("wind", {}).get("speed", 0) for data in weather], dtype=np.float64)
+        )
+
+        segments = []
+        for i, tile in enumerate(tiles):
+            weather_data = fetched[tile]
+            segment = {
+                "start_km": float(starts[i]),
+                "end_km": float(ends[i]),
+                "location": {"lat": float(mid_lats[i]), "lon": float(mid_lons[i])},
+                "tile": tile,
+                "weather": None,
+                "impact_factor": None
+            }
+            if weather_data:
+                segment["weather"] = {
+                    "temp": weather_data.get("main", {}).get("temp"),
+                    "humidity": weather_data.get("main", {}).get("humidity"),
+                    "wind_speed": weather_data.get("wind", {}).get("speed"),
+                    "condition": (weather_data.get("weather") or [{}])[0].get("main")
+                }
+                segment["impact_factor"] = float(impacts[i])
+            segments.append(segment)
+
+        return {
+            "total_distance": total,
+            "interval_km": interval_km,
+            "tiles": len(unique),
+            "missing_tiles": sum(1 for tile in unique if fetched[tile] is None),
+            "segments": segments
+        }
+
+    def interpolate_forecast(self, tiles: Sequence[str], times: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        由已缓存的预报插值得到各网格在对应时刻的天气，不请求上游
+        返回各字段的数组，预报未缓存的点为 NaN；extrapolated 标记超出预报范围的时刻
+        """
+        times = np.asarray(times, dtype=np.float64)
+        result = {field: np.full(len(times), np.nan) for field in FORECAST_FIELDS}
+        result["extrapolated"] = np.zeros(len(times), dtype=bool)
+
+        tiles = np.asarray(tiles)
+        for tile in np.unique(tiles):
+            entry = self._forecast_cache.get(str(tile))
+            if entry is None:
+                continue
+            series = entry.value
+            mask = tiles == tile
+            for field, values in series.at(times[mask]).items():
+                result[field][mask] = values
+            result["extrapolated"][mask] = (times[mask] < series.start) | (times[mask] > series.end)
+        return result
+
+    async def forecast_at(
+        self,
+        lats: Sequence[float],
+        lons: Sequence[float],
+        times: Sequence[float]
+    ) -> Dict[str, Any]:
+        """
+        获取各位置在指定时刻（Unix 秒）的预报天气
+        每个网格的预报只在未缓存时请求一次，之后全部由缓存插值得到
+        """
+        tiles = [self.tile_of(lat, lon) for lat, lon in zip(lats, lons)]
+        semaphore = asyncio.Semaphore(max(1, self.route_concurrency))
+
+        async def load(tile: str) -> None:
+            async with semaphore:
+                try:
+                    await self.get_forecast_series(tile)
+                except Exception as e:
+                    logger.error(f"Error getting forecast for tile {tile}: {str(e) or type(e).__name__}")
+
+        missing = [tile for tile in dict.fromkeys(tiles) if self._forecast_cache.get(tile) is None]
+        await asyncio.gather(*[load(tile) for tile in missing])
+
+        values = self.interpolate_forecast(tiles, np.asarray(times, dtype=np.float64))
+        return {"tiles": tiles, **values}
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """天气缓存命中统计"""
+        return {
+            "weather": dict(self._weather_cache.stats(), tile_precision=self.tile_precision),
+            "forecast": self._forecast_cache.stats(),
+            "single_flight": self._flight.stats()
+        }
 
     def calculate_weather_impact(self, weather_data: Dict[str, Any]) -> float:
         """
@@ -50,27 +251,8 @@ class WeatherService:
         if not weather_data:
             return 0.0
 
-        impact = 0.0
-        temp = weather_data.get("main", {}).get("temp", 20)
-        humidity = weather_data.get("main", {}).get("humidity", 50)
-        wind_speed = weather_data.get("wind", {}).get("speed", 0)
-
-        # 温度影响
-        if temp < 0:
-            impact += 0.3
-        elif temp < 10:
-            impact += 0.2
-        elif temp > 30:
-            impact += 0.15
-
-        # 湿度影响
-        if humidity > 80:
-            impact += 0.1
-
-        # 风速影响
-        if wind_speed > 20:
-            impact += 0.2
-        elif wind_speed > 10:
-            impact += 0.1
-
-        return min(impact, 1.0) 
\ No newline at end of file
+        return weather_impact(
+            weather_data.get("main", {}).get("temp", 20),
+            weather_data.get("main", {}).get("humidity", 50),
+            weather_data.get("wind", {}).get("speed", 0)
+        )
@@ -0,0 +1,351 @@
+"""
+后端压测工具
+
+以固定目标速率（开环）向 /api/tesla/*、/api/weather/*、/api/range-anxiety/* 发送请求，
+统计各接口的 p50/p95/p99 延迟、错误数和吞吐量。延迟从计划发送时刻起算，
+服务端变慢时排队时间也会计入，避免协调遗漏（coordinated omission）低估尾延迟。
+
+示例（先启动 bench.mock_upstream 和后端服务）：
+    python -m bench.load_test --base-url http://localhost:8000 --rps 100 --duration 30 \\
+        --groups tesla,weather --mock-url http://localhost:9000
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+import numpy as np
+import aiohttp
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+RequestSpec = Tuple[str, str, Optional[Dict[str, Any]], Optional[Any]]
+
+
+class Scenario:
+    """一类压测请求：所属接口分组、权重及请求生成函数"""
+
+    def __init__(
+        self,
+        name: str,
+        group: str,
+        weight: float,
+        build: Callable[["LoadContext"], RequestSpec],
+        needs_vehicle: bool = False
+    ):
+        self.name = name
+        self.group = group
+        self.weight = weight
+        self.build = build
+        self.needs_vehicle = needs_vehicle
+
+
+class LoadContext:
+    """压测过程中共享的随机数、车辆列表和坐标范围"""
+
+    def __init__(self, region: Tuple[float, float, float, float], seed: int):
+        self.region = region
+        self.rng = random.Random(seed)
+        self.vehicle_ids: List[str] = []
+
+    def location(self) -> Dict[str, float]:
+        lat_min, lon_min, lat_max, lon_max = self.region
+        return {
+            "lat": round(self.rng.uniform(lat_min, lat_max), 4),
+            "lon": round(self.rng.uniform(lon_min, lon_max), 4)
+        }
+
+    def vehicle_id(self) -> str:
+        return self.rng.choice(self.vehicle_ids)
+
+
+def _route_request(ctx: LoadContext) -> RequestSpec:
+    params = {"current_battery_level": ctx.rng.randint(30, 100), "max_range": ctx.rng.choice((400, 500))}
+    body = {"start_location": ctx.location(), "end_location": ctx.location()}
+    return "POST", "/api/tesla/route", params, body
+
+
+def _reachable_request(ctx: LoadContext) -> RequestSpec:
+    location = ctx.location()
+    params = {
+        "lat": location["lat"],
+        "lon": location["lon"],
+        "current_battery_level": ctx.rng.randint(10, 100),
+        "max_range": 500
+    }
+    return "GET", "/api/tesla/reachable", params, None
+
+
+def _range_anxiety_request(ctx: LoadContext) -> RequestSpec:
+    body = {
+        "vehicle_data": {
+            "battery_capacity": 75,
+            "current_charge": ctx.rng.uniform(10, 75),
+            "max_range": 500,
+            "model_type": ctx.rng.choice(("Model 3", "Model Y", "Model S", "Model X")),
+            "passengers": ctx.rng.randint(1, 5),
+            "cargo_weight": ctx.rng.uniform(0, 200)
+        },
+        "weather_data": {
+            "temp": ctx.rng.uniform(-10, 35),
+            "humidity": ctx.rng.uniform(20, 95),
+            "wind_speed": ctx.rng.uniform(0, 25)
+        },
+        "route_data": {
+            "distance": ctx.rng.uniform(10, 400),
+            "elevation_change": ctx.rng.uniform(-500, 500)
+        }
+    }
+    return "POST", "/api/range-anxiety/calculate", None, body
+
+
+def _vehicle_range_anxiety_request(ctx: LoadContext) -> RequestSpec:
+    destination = ctx.location()
+    params = {"dest_lat": destination["lat"], "dest_lon": destination["lon"]}
+    return "GET", f"/api/range-anxiety/vehicles/{ctx.vehicle_id()}", params, None
+
+
+def _weather_request(path: str) -> Callable[[LoadContext], RequestSpec]:
+    def build(ctx: LoadContext) -> RequestSpec:
+        return "GET", path, ctx.location(), None
+    return build
+
+
+SCENARIOS = [
+    Scenario(
+        "tesla.vehicle_data",
+        "tesla",
+        3,
+        lambda ctx: ("GET", f"/api/tesla/vehicles/{ctx.vehicle_id()}", None, None),
+        needs_vehicle=True
+    ),
+    Scenario(
+        "tesla.vehicle_state",
+        "tesla",
+        2,
+        lambda ctx: ("GET", f"/api/tesla/vehicles/{ctx.vehicle_id()}/state", None, None),
+        needs_vehicle=True
+    ),
+    Scenario("tesla.superchargers", "tesla", 0.5, lambda ctx: ("GET", "/api/tesla/superchargers", None, None)),
+    Scenario("tesla.route", "tesla", 1, _route_request),
+    Scenario("tesla.reachable", "tesla", 2, _reachable_request),
+    Scenario("weather.current", "weather", 3, _weather_request("/api/weather/current")),
+    Scenario("weather.forecast", "weather", 1, _weather_request("/api/weather/forecast")),
+    Scenario("weather.impact", "weather", 2, _weather_request("/api/weather/impact")),
+    Scenario("range_anxiety.calculate", "range-anxiety", 3, _range_anxiety_request),
+    Scenario("range_anxiety.vehicle", "range-anxiety", 1, _vehicle_range_anxiety_request, needs_vehicle=True),
+    Scenario(
+        "range_anxiety.model_efficiency",
+        "range-anxiety",
+        1,
+        lambda ctx: ("GET", "/api/range-anxiety/model-efficiency", {"model_type": "Model Y"}, None)
+    )
+]
+
+
+class LoadTest:
+    def __init__(
+        self,
+        base_url: str,
+        scenarios: List[Scenario],
+        rps: float,
+        duration: float,
+        max_inflight: int,
+        ctx: LoadContext,
+        timeout: float = 30.0
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.scenarios = scenarios
+        self.weights = [scenario.weight for scenario in scenarios]
+        self.rps = rps
+        self.duration = duration
+        self.max_inflight = max_inflight
+        self.ctx = ctx
+        self.timeout = timeout
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[int, int] = defaultdict(int)
+        self.token: Optional[str] = None
+        self.tesla_token: Optional[str] = None
+
+    def headers_for(self, path: str) -> Dict[str, str]:
+        """/api/tesla/* 以 Tesla 令牌认证，其余接口以应用令牌认证并在 X-Tesla-Token 中附带 Tesla 令牌"""
+        if path.startswith("/api/tesla/"):
+            return {"Authorization": f"Bearer {self.tesla_token}"}
+        headers = {"Authorization": f"Bearer {self.token}"}
+        if self.tesla_token:
+            headers["X-Tesla-Token"] = self.tesla_token
+        return headers
+
+    async def setup(self, session: aiohttp.ClientSession, email: str, password: str) -> None:
+        """注册并登录压测账号，登录 Tesla 账号并获取车辆列表"""
+        await session.post(
+            f"{self.base_url}/api/auth/register",
+            params={"email": email, "password": password, "username": "loadtest"}
+        )
+        async with session.post(
+            f"{self.base_url}/api/auth/token",
+            data={"username": email, "password": password}
+        ) as response:
+            response.raise_for_status()
+            self.token = (await response.json())["access_token"]
+
+        if any(scenario.group == "tesla" or scenario.needs_vehicle for scenario in self.scenarios):
+            async with session.post(
+                f"{self.base_url}/api/tesla/login",
+                params={"email": email, "password": password}
+            ) as response:
+                response.raise_for_status()
+                self.tesla_token = (await response.json())["access_token"]
+
+        if any(scenario.needs_vehicle for scenario in self.scenarios):
+            path = "/api/tesla/vehicles"
+            async with session.get(f"{self.base_url}{path}", headers=self.headers_for(path)) as response:
+                response.raise_for_status()
+                vehicles = await response.json()
+            self.ctx.vehicle_ids = [str(vehicle.get("id_s") or vehicle["id"]) for vehicle in vehicles]
+            if not self.ctx.vehicle_ids:
+                self.scenarios = [scenario for scenario in self.scenarios if not scenario.needs_vehicle]
+                self.weights = [scenario.weight for scenario in self.scenarios]
+
+    async def _send(
+        self,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        scenario: Scenario,
+        scheduled: float
+    ) -> None:
+        method, path, params, body = scenario.build(self.ctx)
+        try:
+            async with semaphore:
+                async with session.request(
+                    method,
+                    f"{self.base_url}{path}",
+                    params=params,
+                    json=body,
+                    headers=self.headers_for(path)
+                ) as response:
+                    await response.read()
+                    self.statuses[response.status] += 1
+                    if response.status >= 400:
+                        self.errors[scenario.name] += 1
+        except Exception:
+            self.statuses[0] += 1
+            self.errors[scenario.name] += 1
+        self.latencies[scenario.name].append(time.perf_counter() - scheduled)
+
+    async def run(self, session: aiohttp.ClientSession) -> float:
+        """按目标速率发送请求直到持续时间结束，返回实际耗时（秒）"""
+        semaphore = asyncio.Semaphore(self.max_inflight)
+        total = int(self.rps * self.duration)
+        tasks = []
+        start = time.perf_counter()
+        for i in range(total):
+            scheduled = start + i / self.rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            scenario = self.ctx.rng.choices(self.scenarios, self.weights)[0]
+            tasks.append(asyncio.create_task(self._send(session, semaphore, scenario, scheduled)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """汇总延迟分位数（毫秒）和吞吐量"""
+        def summarize(samples: List[float], errors: int) -> Dict[str, Any]:
+            latencies = np.asarray(samples) * 1000
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+            return {
+                "count": len(latencies),
+                "errors": errors,
+                "mean_ms": float(latencies.mean()) if len(latencies) else 0.0,
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(latencies.max()) if len(latencies) else 0.0,
+                "throughput_rps": len(latencies) / elapsed if elapsed else 0.0
+            }
+
+        everything = [latency for samples in self.latencies.values() for latency in samples]
+        return {
+            "target_rps": self.rps,
+            "duration_s": elapsed,
+            "overall": summarize(everything, sum(self.errors.values())),
+            "endpoints": {
+                name: summarize(samples, self.errors[name])
+                for name, samples in sorted(self.latencies.items())
+            },
+            "status_codes": {str(code): count for code, count in sorted(self.statuses.items())}
+        }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    header = f"{'endpoint':<32}{'count':>8}{'errors':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["endpoints"].items()) + [("overall", report["overall"])]
+    for name, row in rows:
+        print(
+            f"{name:<32}{row['count']:>8}{row['errors']:>8}{row['throughput_rps']:>9.1f}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}"
+        )
+    print(f"\ntarget {report['target_rps']} rps over {report['duration_s']:.1f}s, latencies in ms")
+    print("status codes: " + ", ".join(f"{code}={count}" for code, count in report["status_codes"].items()))
+    if "upstream" in report:
+        print(f"upstream requests: {report['upstream'].get('total', 0)}")
+        unauthorized = report["upstream"].get("unauthorized")
+        if unauthorized:
+            print("upstream rejected tokens: " + ", ".join(f"{route}={count}" for route, count in unauthorized.items()))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    groups = set(args.groups.split(","))
+    scenarios = [scenario for scenario in SCENARIOS if scenario.group in groups]
+    if not scenarios:
+        raise SystemExit(f"No scenarios for groups {args.groups!r}")
+
+    ctx = LoadContext(tuple(args.region), args.seed)
+    test = LoadTest(args.base_url, scenarios, args.rps, args.duration, args.max_inflight, ctx)
+    connector = aiohttp.TCPConnector(limit=args.max_inflight)
+    timeout = aiohttp.ClientTimeout(total=test.timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await test.setup(session, args.email, args.password)
+        if args.mock_url:
+            await session.post(f"{args.mock_url.rstrip('/')}/_stats/reset")
+
+        elapsed = await test.run(session)
+        report = test.report(elapsed)
+
+        if args.mock_url:
+            async with session.get(f"{args.mock_url.rstrip('/')}/_stats") as response:
+                report["upstream"] = await response.json()
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Drive the backend at a target request rate and report latency percentiles")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--rps", type=float, default=50, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="test duration in seconds")
+    parser.add_argument("--max-inflight", type=int, default=256, help="maximum concurrent requests")
+    parser.add_argument("--groups", default="tesla,weather,range-anxiety",
+                        help="comma separated endpoint groups to exercise")
+    parser.add_argument("--region", type=float, nargs=4, default=(25.0, -124.0, 49.0, -67.0),
+                        metavar=("LAT_MIN", "LON_MIN", "LAT_MAX", "LON_MAX"),
+                        help="bounding box for request locations")
+    parser.add_argument("--email", default="loadtest@example.com")
+    parser.add_argument("--password", default="loadtest")
+    parser.add_argument("--mock-url", help="mock upstream URL, used to report upstream request counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="also write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
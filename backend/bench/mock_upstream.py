@@ -0,0 +1,402 @@
+"""
+本地模拟上游服务（Tesla Owner API、Tesla 认证、OpenWeather）
+
+按配置的延迟和错误率响应请求，车辆、充电站和天气数据均为按随机种子生成的合成数据，
+用于在不访问真实接口的情况下对后端做可重复的压测。
+
+启动：
+    python -m bench.mock_upstream --port 9000 --vehicles 200 --chargers 5000 \\
+        --latency 80 --jitter 40 --profile weather:latency=150,error_rate=0.02
+
+后端指向模拟服务：
+    TESLA_API_BASE_URL=http://localhost:9000/api/1
+    TESLA_AUTH_URL=http://localhost:9000/oauth2/v3
+    OPENWEATHER_BASE_URL=http://localhost:9000/data/2.5
+
+Tesla 接口只接受由 /oauth2/v3/token 签发的令牌或 --service-token 指定的服务端令牌（对应后端的
+TESLA_SERVICE_TOKEN），其他 Bearer 令牌返回 401，便于在压测中发现令牌传错的问题。
+
+GET /_stats 返回各上游接口收到的请求数及被拒绝的令牌数，POST /_stats/reset 清零。
+"""
+import math
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from aiohttp import web
+
+PROFILE_GROUPS = ("auth", "tesla", "weather")
+MODELS = ("Model 3", "Model Y", "Model S", "Model X")
+
+
+class UpstreamProfile:
+    """一组上游接口的延迟与错误配置"""
+
+    def __init__(
+        self,
+        latency_ms: float = 50.0,
+        jitter_ms: float = 20.0,
+        error_rate: float = 0.0,
+        error_status: int = 503
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def delay(self, rng: random.Random) -> float:
+        """本次请求的响应延迟（秒），在均值上下均匀抖动"""
+        jitter = rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def copy(self, **overrides) -> "UpstreamProfile":
+        values = {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "error_rate": self.error_rate,
+            "error_status": self.error_status
+        }
+        values.update(overrides)
+        return UpstreamProfile(**values)
+
+
+class MockUpstream:
+    """合成数据及请求处理"""
+
+    def __init__(
+        self,
+        profiles: Dict[str, UpstreamProfile],
+        vehicles: int = 100,
+        chargers: int = 2000,
+        asleep_fraction: float = 0.0,
+        wake_delay: float = 5.0,
+        region: tuple = (25.0, -124.0, 49.0, -67.0),
+        seed: int = 0,
+        service_token: Optional[str] = "mock"
+    ):
+        self.profiles = profiles
+        # 已签发的 Tesla 令牌，服务端令牌无需登录即可使用
+        self.tokens = {service_token} if service_token else set()
+        self.unauthorized: Counter = Counter()
+        self.wake_delay = wake_delay
+        self.region = region
+        self.rng = random.Random(seed)
+        self.requests: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.vehicles = self._make_vehicles(vehicles, asleep_fraction)
+        self.chargers = self._make_chargers(chargers)
+        # 车辆上线时间（monotonic），休眠车辆为 None
+        self._online_at: Dict[str, Optional[float]] = {
+            vehicle["id_s"]: None if vehicle["state"] == "asleep" else 0.0
+            for vehicle in self.vehicles
+        }
+
+    def _random_location(self) -> Dict[str, float]:
+        lat_min, lon_min, lat_max, lon_max = self.region
+        return {
+            "lat": self.rng.uniform(lat_min, lat_max),
+            "lon": self.rng.uniform(lon_min, lon_max)
+        }
+
+    def _make_vehicles(self, count: int, asleep_fraction: float) -> List[Dict[str, Any]]:
+        vehicles = []
+        for i in range(count):
+            vehicle_id = 1000000 + i
+            location = self._random_location()
+            vehicles.append({
+                "id": vehicle_id,
+                "id_s": str(vehicle_id),
+                "vin": f"5YJ3MOCK{vehicle_id:09d}",
+                "display_name": f"Mock {i}",
+                "model": MODELS[i % len(MODELS)],
+                "state": "asleep" if self.rng.random() < asleep_fraction else "online",
+                "battery_level": self.rng.randint(10, 100),
+                "max_range": self.rng.choice((400, 450, 500, 550)),
+                "location": location,
+                "odometer": self.rng.uniform(1000, 80000)
+            })
+        return vehicles
+
+    def _make_chargers(self, count: int) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": i,
+                "name": f"Mock Supercharger {i}",
+                "location": self._random_location(),
+                "total_stalls": self.rng.choice((8, 12, 16, 20)),
+                "available_stalls": self.rng.randint(0, 8)
+            }
+            for i in range(count)
+        ]
+
+    def _vehicle(self, vehicle_id: str) -> Optional[Dict[str, Any]]:
+        if vehicle_id not in self._online_at:
+            return None
+        return self.vehicles[int(vehicle_id) - 1000000]
+
+    def _is_online(self, vehicle_id: str) -> bool:
+        online_at = self._online_at.get(vehicle_id)
+        return online_at is not None and time.monotonic() >= online_at
+
+    @staticmethod
+    def _weather_at(lat: float, lon: float, dt: float) -> Dict[str, Any]:
+        """按位置和时间生成平滑变化的天气，相同输入得到相同结果"""
+        hour = dt / 3600
+        temp = 28 - 0.6 * abs(lat) + 6 * math.sin(math.radians(lon) * 3) + 5 * math.sin(2 * math.pi * hour / 24)
+        humidity = 55 + 35 * math.sin(math.radians(lat * 7 + lon * 3) + hour / 12)
+        wind_speed = 6 + 6 * math.sin(math.radians(lat * 5 - lon * 4) + hour / 8) ** 2
+        condition = "Rain" if humidity > 85 else "Clouds" if humidity > 70 else "Clear"
+        return {
+            "main": {
+                "temp": round(temp, 2),
+                "feels_like": round(temp - wind_speed * 0.3, 2),
+                "humidity": round(humidity),
+                "pressure": 1013
+            },
+            "wind": {
+                "speed": round(wind_speed, 2),
+                "deg": round((lon * 7 + lat * 3 + hour * 15) % 360)
+            },
+            "weather": [{"main": condition, "description": condition.lower()}],
+            "dt": int(dt)
+        }
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        if request.path.startswith("/_"):
+            return await handler(request)
+
+        group = "auth" if request.path.startswith("/oauth2") else "weather" if request.path.startswith("/data") else "tesla"
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        self.requests[route] += 1
+
+        profile = self.profiles[group]
+        await asyncio.sleep(profile.delay(self.rng))
+        if group == "tesla" and not self._authorized(request):
+            self.unauthorized[route] += 1
+            return web.json_response({"error": "invalid bearer token"}, status=401)
+        if profile.error_rate and self.rng.random() < profile.error_rate:
+            self.errors[route] += 1
+            return web.json_response({"error": "mock upstream error"}, status=profile.error_status)
+        return await handler(request)
+
+    def _authorized(self, request: web.Request) -> bool:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and token in self.tokens
+
+    async def token(self, request: web.Request) -> web.Response:
+        access_token = f"mock-{self.rng.getrandbits(64):016x}"
+        self.tokens.add(access_token)
+        return web.json_response({
+            "access_token": access_token,
+            "token_type": "bearer",
+            "expires_in": 28800
+        })
+
+    async def list_vehicles(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "response": [
+                {
+                    "id": vehicle["id"],
+                    "id_s": vehicle["id_s"],
+                    "vin": vehicle["vin"],
+                    "display_name": vehicle["display_name"],
+                    "state": "online" if self._is_online(vehicle["id_s"]) else "asleep"
+                }
+                for vehicle in self.vehicles
+            ],
+            "count": len(self.vehicles)
+        })
+
+    async def superchargers(self, request: web.Request) -> web.Response:
+        return web.json_response({"response": self.chargers})
+
+    def _asleep(self) -> web.Response:
+        return web.json_response({"response": None, "error": "vehicle unavailable: asleep"}, status=408)
+
+    async def vehicle_data(self, request: web.Request) -> web.Response:
+        vehicle_id = request.match_info["vehicle_id"]
+        vehicle = self._vehicle(vehicle_id)
+        if vehicle is None:
+            raise web.HTTPNotFound()
+        if not self._is_online(vehicle_id):
+            return self._asleep()
+
+        battery_level = vehicle["battery_level"]
+        return web.json_response({
+            "response": {
+                "id": vehicle["id"],
+                "vin": vehicle["vin"],
+                "display_name": vehicle["display_name"],
+                "state": "online",
+                "charge_state": {
+                    "battery_level": battery_level,
+                    "battery_range": round(vehicle["max_range"] * battery_level / 100 / 1.609, 1),
+                    "charging_state": "Disconnected"
+                },
+                "drive_state": {
+                    "latitude": vehicle["location"]["lat"],
+                    "longitude": vehicle["location"]["lon"],
+                    "heading": 90,
+                    "speed": None,
+                    "timestamp": int(time.time() * 1000)
+                },
+                "vehicle_config": {"car_type": vehicle["model"].lower().replace(" ", "")},
+                "vehicle_state": {"odometer": round(vehicle["odometer"], 1), "locked": True}
+            }
+        })
+
+    async def vehicle_state(self, request: web.Request) -> web.Response:
+        vehicle_id = request.match_info["vehicle_id"]
+        vehicle = self._vehicle(vehicle_id)
+        if vehicle is None:
+            raise web.HTTPNotFound()
+        if not self._is_online(vehicle_id):
+            return self._asleep()
+        return web.json_response({
+            "response": {
+                "odometer": round(vehicle["odometer"], 1),
+                "locked": True,
+                "sentry_mode": False,
+                "timestamp": int(time.time() * 1000)
+            }
+        })
+
+    async def wake_up(self, request: web.Request) -> web.Response:
+        vehicle_id = request.match_info["vehicle_id"]
+        if self._vehicle(vehicle_id) is None:
+            raise web.HTTPNotFound()
+        if self._online_at[vehicle_id] is None:
+            self._online_at[vehicle_id] = time.monotonic() + self.wake_delay
+        state = "online" if self._is_online(vehicle_id) else "asleep"
+        return web.json_response({"response": {"id_s": vehicle_id, "state": state}})
+
+    def _coordinates(self, request: web.Request) -> Optional[tuple]:
+        try:
+            return float(request.query["lat"]), float(request.query["lon"])
+        except (KeyError, ValueError):
+            return None
+
+    async def weather(self, request: web.Request) -> web.Response:
+        coordinates = self._coordinates(request)
+        if coordinates is None:
+            return web.json_response({"cod": "400", "message": "wrong latitude or longitude"}, status=400)
+        lat, lon = coordinates
+        data = self._weather_at(lat, lon, time.time())
+        data.update({"coord": {"lat": lat, "lon": lon}, "name": "Mock", "cod": 200})
+        return web.json_response(data)
+
+    async def forecast(self, request: web.Request) -> web.Response:
+        coordinates = self._coordinates(request)
+        if coordinates is None:
+            return web.json_response({"cod": "400", "message": "wrong latitude or longitude"}, status=400)
+        lat, lon = coordinates
+        # 与 OpenWeather 一致：5 天内每 3 小时一条
+        start = (int(time.time()) // 10800 + 1) * 10800
+        entries = []
+        for i in range(40):
+            dt = start + i * 10800
+            entry = self._weather_at(lat, lon, dt)
+            entry["dt_txt"] = datetime.utcfromtimestamp(dt).strftime("%Y-%m-%d %H:%M:%S")
+            entries.append(entry)
+        return web.json_response({
+            "cod": "200",
+            "cnt": len(entries),
+            "list": entries,
+            "city": {"name": "Mock", "coord": {"lat": lat, "lon": lon}}
+        })
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "requests": dict(self.requests),
+            "errors": dict(self.errors),
+            "unauthorized": dict(self.unauthorized),
+            "total": sum(self.requests.values())
+        })
+
+    async def reset_stats(self, request: web.Request) -> web.Response:
+        self.requests.clear()
+        self.errors.clear()
+        self.unauthorized.clear()
+        return web.json_response({"ok": True})
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.add_routes([
+            web.post("/oauth2/v3/token", self.token),
+            web.get("/api/1/vehicles", self.list_vehicles),
+            web.get("/api/1/superchargers", self.superchargers),
+            web.get("/api/1/vehicles/{vehicle_id}/vehicle_data", self.vehicle_data),
+            web.get("/api/1/vehicles/{vehicle_id}/vehicle_state", self.vehicle_state),
+            web.post("/api/1/vehicles/{vehicle_id}/wake_up", self.wake_up),
+            web.get("/data/2.5/weather", self.weather),
+            web.get("/data/2.5/forecast", self.forecast),
+            web.get("/_stats", self.stats),
+            web.post("/_stats/reset", self.reset_stats)
+        ])
+        return app
+
+
+def parse_profile(spec: str, base: UpstreamProfile) -> tuple:
+    """解析 group:key=value,... 形式的分组配置"""
+    group, _, body = spec.partition(":")
+    if group not in PROFILE_GROUPS:
+        raise argparse.ArgumentTypeError(f"Unknown profile group {group!r}, expected one of {', '.join(PROFILE_GROUPS)}")
+
+    keys = {"latency": "latency_ms", "jitter": "jitter_ms", "error_rate": "error_rate", "error_status": "error_status"}
+    overrides = {}
+    for item in filter(None, body.split(",")):
+        key, _, value = item.partition("=")
+        if key not in keys:
+            raise argparse.ArgumentTypeError(f"Unknown profile key {key!r}, expected one of {', '.join(keys)}")
+        overrides[keys[key]] = int(value) if key == "error_status" else float(value)
+    return group, base.copy(**overrides)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve a mock Tesla / OpenWeather upstream for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--vehicles", type=int, default=100, help="number of synthetic vehicles")
+    parser.add_argument("--chargers", type=int, default=2000, help="number of synthetic superchargers")
+    parser.add_argument("--asleep-fraction", type=float, default=0.0, help="fraction of vehicles that start asleep")
+    parser.add_argument("--wake-delay", type=float, default=5.0, help="seconds for a woken vehicle to come online")
+    parser.add_argument("--region", type=float, nargs=4, default=(25.0, -124.0, 49.0, -67.0),
+                        metavar=("LAT_MIN", "LON_MIN", "LAT_MAX", "LON_MAX"),
+                        help="bounding box for synthetic locations")
+    parser.add_argument("--latency", type=float, default=50.0, help="mean response latency in ms")
+    parser.add_argument("--jitter", type=float, default=20.0, help="uniform latency jitter in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument("--profile", action="append", default=[],
+                        help="per-group override, e.g. weather:latency=200,jitter=50,error_rate=0.05 "
+                             f"(groups: {', '.join(PROFILE_GROUPS)})")
+    parser.add_argument("--service-token", default="mock",
+                        help="bearer token accepted without login, matching the backend's TESLA_SERVICE_TOKEN")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    base = UpstreamProfile(args.latency, args.jitter, args.error_rate, args.error_status)
+    profiles = {group: base for group in PROFILE_GROUPS}
+    for spec in args.profile:
+        group, profile = parse_profile(spec, base)
+        profiles[group] = profile
+
+    upstream = MockUpstream(
+        profiles,
+        vehicles=args.vehicles,
+        chargers=args.chargers,
+        asleep_fraction=args.asleep_fraction,
+        wake_delay=args.wake_delay,
+        region=tuple(args.region),
+        seed=args.seed,
+        service_token=args.service_token
+    )
+    web.run_app(upstream.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()